@@ -0,0 +1,48 @@
+# file: check_chunked_tsv.py
+# compares the output of extract-info-xls-gem.py --chunksize with the
+# whole-file path (search, and XML via --stream) on generated TSV files whose
+# column types change between chunks. exits with 1 if any output differs.
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+
+import make_corpus
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_DIR, "extract-info-xls-gem.py")
+
+
+def run(args) -> bytes:
+    return subprocess.run([sys.executable, SCRIPT] + args, cwd=REPO_DIR, capture_output=True, check=True).stdout
+
+
+def check(path: str, chunksize: int, phrases) -> bool:
+    ok = True
+    cases = [(["-s", phrase], f"search {phrase!r}") for phrase in phrases] + [([], "xml")]
+    for extra, label in cases:
+        whole = run(["-f", path, "-t", "tsv", "--no-cache"] + (extra or ["--stream"]))
+        chunked = run(["-f", path, "-t", "tsv", "--chunksize", str(chunksize)] + extra)
+        same = whole == chunked
+        ok &= same
+        print(f"{'ok  ' if same else 'DIFF'} {os.path.basename(path)} chunksize={chunksize} {label}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that chunked TSV output matches the whole-file output")
+    parser.add_argument("--rows", type=int, default=30000, help="Rows of the generated tables")
+    parser.add_argument("--chunksize", type=int, nargs="+", default=[1000, 20000], help="Chunk sizes to check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = os.path.join(tmp, "variants.tsv")
+        table = os.path.join(tmp, "table.tsv")
+        make_corpus.write_variant_tsv(variants, args.rows)
+        make_corpus.write_tsv(table, args.rows)
+        ok = True
+        for chunksize in args.chunksize:
+            ok &= check(variants, chunksize, ["100001", "x", "true", "0.5"])
+            ok &= check(table, chunksize, ["gyra", "s1999"])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,223 @@
+# file: make_corpus.py
+# synthetic, seeded corpora for the benchmarks: BioC XML (tmVar3/PubTator3)
+# and BioC JSON (BioNExt) documents, mutation CSVs, large xlsx/tsv tables, PMC
+# .tar.gz packages and the stub-server fixtures that serve them.
+import io
+import os
+import csv
+import json
+import random
+import tarfile
+import zipfile
+import argparse
+from typing import List
+from xml.sax.saxutils import escape
+
+AA3 = ["Ala", "Arg", "Asn", "Asp", "Cys", "Glu", "Gln", "Gly", "His", "Ile",
+       "Leu", "Lys", "Met", "Phe", "Pro", "Ser", "Thr", "Trp", "Tyr", "Val"]
+AA1 = "ARNDCEQGHILKMFPSTWYV"
+GENES = ["gyrA", "gyrB", "parC", "parE", "rpoB", "katG", "inhA", "embB", "pncA", "ampC", "blaTEM", "mecA"]
+FILLER = "The strain was isolated and sequenced and the resistance phenotype was confirmed by broth microdilution. "
+
+
+def ids(n: int, start: int = 10000000):
+    # matching (PMID, PMCID) pairs
+    return [(str(start + i), f"PMC{start + i}") for i in range(n)]
+
+
+def random_mutation(rng: random.Random) -> str:
+    kind = rng.random()
+    pos = rng.randint(1, 999)
+    if kind < 0.4:
+        return f"{rng.choice(AA1)}{pos}{rng.choice(AA1)}"
+    if kind < 0.7:
+        return f"p.{rng.choice(AA3)}{pos}{rng.choice(AA3)}"
+    return f"c.{pos}{rng.choice('ACGT')}>{rng.choice('ACGT')}"
+
+
+def _passage_text(rng: random.Random, mutations: List[str]):
+    # text with the mutations embedded, and their offsets
+    text, spans = "", []
+    for mutation in mutations:
+        text += FILLER * rng.randint(1, 3) + f"{rng.choice(GENES)} "
+        spans.append((len(text), mutation))
+        text += mutation + " "
+    return text, spans
+
+
+def bioc_document_xml(pmid: str, rng: random.Random, n_mutations: int) -> str:
+    text, spans = _passage_text(rng, [random_mutation(rng) for _ in range(n_mutations)])
+    annotations = "".join(
+        f'<annotation id="{i}"><infon key="type">{"DNAMutation" if m.startswith("c.") else "ProteinMutation"}</infon>'
+        f'<infon key="identifier">{escape(m)}</infon><location offset="{offset}" length="{len(m)}"/>'
+        f'<text>{escape(m)}</text></annotation>'
+        for i, (offset, m) in enumerate(spans)
+    )
+    return (f"<document><id>{pmid}</id><passage><infon key=\"type\">abstract</infon><offset>0</offset>"
+            f"<text>{escape(text)}</text>{annotations}</passage></document>")
+
+
+def write_bioc_xml(path: str, pmids: List[str], n_mutations: int = 20, seed: int = 0) -> None:
+    # one BioC collection as returned by PubTator3 export/biocxml
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='UTF-8'?><!DOCTYPE collection SYSTEM 'BioC.dtd'>"
+                "<collection><source>PubTator</source><date></date><key></key>")
+        for pmid in pmids:
+            f.write(bioc_document_xml(pmid, rng, n_mutations))
+        f.write("</collection>")
+
+
+def write_bioc_json(path: str, pmids: List[str], n_mutations: int = 20, seed: int = 0) -> None:
+    # BioNExt tagger output
+    rng = random.Random(seed)
+    documents = []
+    for pmid in pmids:
+        text, spans = _passage_text(rng, [random_mutation(rng) for _ in range(n_mutations)])
+        documents.append({"id": pmid, "passages": [{"offset": 0, "text": text, "annotations": [
+            {"id": str(i), "infons": {"type": "SequenceVariant", "identifier": m}, "text": m,
+             "locations": [{"offset": offset, "length": len(m)}]}
+            for i, (offset, m) in enumerate(spans)
+        ]}]})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"documents": documents}, f)
+
+
+def write_mutation_csvs(out_dir: str, pmid: str, n_mutations: int, overlap: float = 0.7, seed: int = 0):
+    # extract-mutations.py style CSVs for one article, tmVar3 and BioNExt sharing `overlap` of their mutations
+    rng = random.Random(seed)
+    shared = [random_mutation(rng) for _ in range(int(n_mutations * overlap))]
+    tmvar = shared + [random_mutation(rng) for _ in range(n_mutations - len(shared))]
+    bionext = shared + [random_mutation(rng) for _ in range(n_mutations - len(shared))]
+    tmvar_path = os.path.join(out_dir, f"{pmid}.xml.csv")
+    bionext_path = os.path.join(out_dir, f"{pmid}.bionext.csv")
+    with open(tmvar_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["type", "pmc-id", "identifier", "text", "offset", "length"])
+        for i, m in enumerate(tmvar):
+            writer.writerow(["ProteinMutation", f"PMC{pmid}", m, m, i * 50, len(m)])
+    with open(bionext_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["type", "pmid", "identifier", "text", "offset", "length"])
+        for i, m in enumerate(bionext):
+            writer.writerow(["SequenceVariant", pmid, m, m, i * 50, len(m)])
+    return tmvar_path, bionext_path
+
+
+def _table_rows(n_rows: int, seed: int):
+    rng = random.Random(seed)
+    yield ["Strain", "Gene", "Mutation", "Position", "MIC (mg/L)", "Note"]
+    for i in range(n_rows):
+        yield [f"S{i}", rng.choice(GENES), random_mutation(rng), rng.randint(1, 3000),
+               round(rng.uniform(0.01, 256), 3), rng.choice(["", "resistant", "susceptible", "intermediate"])]
+
+
+def write_xlsx(path: str, n_rows: int, seed: int = 0) -> None:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Mutations")
+    for row in _table_rows(n_rows, seed):
+        ws.append(row)
+    wb.save(path)
+
+
+def write_tsv(path: str, n_rows: int, seed: int = 0) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerows(_table_rows(n_rows, seed))
+
+
+def write_variant_tsv(path: str, n_rows: int, seed: int = 0) -> None:
+    # variant-calling style table whose column types change part way through the
+    # file: chromosomes 1..22 before X/Y, allele frequencies with gaps, a flag
+    # column that only gets empty cells late
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["chrom", "pos", "ref", "alt", "af", "depth", "pass"])
+        for i in range(n_rows):
+            late = i > n_rows * 5 // 6
+            writer.writerow([
+                rng.choice("XY") if late else min(22, 1 + i * 22 // n_rows),
+                100000 + i,
+                rng.choice("ACGT"),
+                rng.choice("ACGT"),
+                "" if rng.random() < 0.01 else round(rng.random(), 4),
+                "" if late and rng.random() < 0.05 else rng.randint(5, 500),
+                "" if late and rng.random() < 0.05 else rng.choice(["True", "False"]),
+            ])
+
+
+def _package_members(pmcid: str, package_kb: int, rng: random.Random):
+    nxml = f"<article><front><article-id pub-id-type=\"pmc\">{pmcid}</article-id></front><body>{FILLER * 50}</body></article>"
+    yield f"{pmcid}/{pmcid}.nxml", nxml.encode()
+    yield f"{pmcid}/supp_table1.xlsx", rng.randbytes(package_kb * 1024)  # incompressible payload
+
+
+def write_pmc_fixtures(fixtures: str, id_pairs, package_kb: int = 256, seed: int = 0) -> None:
+    """
+    PMC packages as served by the ftp site (<fixtures>/ftp/oa_package/..), the
+    OA web service records pointing to them, and EuropePMC zips with the same
+    content.
+    """
+    rng = random.Random(seed)
+    for sub in ("ftp", "oa", "europepmc"):
+        os.makedirs(os.path.join(fixtures, sub), exist_ok=True)
+    for _, pmcid in id_pairs:
+        members = list(_package_members(pmcid, package_kb, rng))
+        rel = f"oa_package/{pmcid[-4:-2]}/{pmcid[-2:]}/{pmcid}.tar.gz"
+        tar_path = os.path.join(fixtures, "ftp", rel)
+        os.makedirs(os.path.dirname(tar_path), exist_ok=True)
+        with tarfile.open(tar_path, "w:gz") as tar:
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        with open(os.path.join(fixtures, "oa", f"{pmcid}.xml"), "w", encoding="utf-8") as f:
+            f.write(f'<OA><responseDate>2025-01-01 00:00:00</responseDate><request id="{pmcid}">'
+                    f'https://www.ncbi.nlm.nih.gov/pmc/utils/oa/oa.fcgi?id={pmcid}</request>'
+                    f'<records returned-count="1" total-count="1"><record id="{pmcid}" citation="" license="CC BY" retracted="no">'
+                    f'<link format="tgz" updated="2025-01-01 00:00:00" href="ftp://ftp.ncbi.nlm.nih.gov/pub/pmc/{rel}"/>'
+                    f'</record></records></OA>')
+        with zipfile.ZipFile(os.path.join(fixtures, "europepmc", f"{pmcid}.zip"), "w") as z:
+            for name, data in members:
+                z.writestr(name.split("/", 1)[1], data)
+
+
+def write_pubtator_fixtures(fixtures: str, id_pairs, n_mutations: int = 20, seed: int = 0) -> None:
+    os.makedirs(os.path.join(fixtures, "pubtator"), exist_ok=True)
+    for i, (pmid, _) in enumerate(id_pairs):
+        write_bioc_xml(os.path.join(fixtures, "pubtator", f"{pmid}.xml"), [pmid], n_mutations, seed + i)
+
+
+def write_id_csv(path: str, id_pairs) -> None:
+    # input list for get-data-v0.1.py / run-ner-v0.1.py / run-pipeline.py
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["PMID", "PMCID"])
+        writer.writerows(id_pairs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus and stub-server fixtures")
+    parser.add_argument("-o", "--output", required=True, help="Directory to write the corpus to")
+    parser.add_argument("--items", type=int, default=50, help="Number of articles")
+    parser.add_argument("--mutations", type=int, default=20, help="Mutations per article")
+    parser.add_argument("--package-kb", type=int, default=256, help="Size of the supplementary payload per PMC package")
+    parser.add_argument("--compare-rows", type=int, default=200, help="Rows of the generated tmVar3/BioNExt mutation CSVs")
+    parser.add_argument("--table-rows", type=int, default=100000, help="Rows of the generated xlsx/tsv tables")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    pairs = ids(args.items)
+    fixtures = os.path.join(args.output, "fixtures")
+    write_id_csv(os.path.join(args.output, "ids.csv"), pairs)
+    write_pmc_fixtures(fixtures, pairs, args.package_kb, args.seed)
+    write_pubtator_fixtures(fixtures, pairs, args.mutations, args.seed)
+    write_bioc_xml(os.path.join(args.output, "collection.xml"), [p for p, _ in pairs], args.mutations, args.seed)
+    write_bioc_json(os.path.join(args.output, "collection.json"), [p for p, _ in pairs], args.mutations, args.seed)
+    write_mutation_csvs(args.output, pairs[0][0], args.compare_rows, seed=args.seed)
+    write_xlsx(os.path.join(args.output, "table.xlsx"), args.table_rows, args.seed)
+    write_tsv(os.path.join(args.output, "table.tsv"), args.table_rows, args.seed)
+    print(f"Corpus written to {args.output}")
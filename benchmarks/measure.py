@@ -0,0 +1,36 @@
+# file: measure.py
+# run a script as __main__ and write its peak RSS (in MB) to a file at exit:
+#   python measure.py <result-file> <script> [args...]
+# the child's ru_maxrss as seen by the parent is not usable for this: linux
+# keeps the high-water mark across execve, so it would include the memory of
+# the benchmark runner that forked it. VmHWM belongs to the new process image.
+import os
+import sys
+import atexit
+import runpy
+import resource
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _report(path: str) -> None:
+    with open(path, "w") as f:
+        f.write(f"{peak_rss_mb():.1f}\n")
+
+
+if __name__ == "__main__":
+    result_path, script = sys.argv[1], os.path.abspath(sys.argv[2])
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(script)
+    atexit.register(_report, result_path)
+    runpy.run_path(script, run_name="__main__")
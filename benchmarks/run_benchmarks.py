@@ -0,0 +1,263 @@
+# file: run_benchmarks.py
+# throughput benchmarks for the pipeline scripts at fixed corpus sizes. the
+# download and NER scripts talk to the local stand-in servers (stub_servers.py)
+# through their endpoint environment overrides, so no request leaves the
+# machine. every benchmark runs the script as a child process and records
+# wall time, items/s, MB/s and the child's peak RSS; the results are written
+# as JSON so runs can be compared (see compare_results below). rates are only
+# recorded for runs that exit cleanly, and for the download and NER scripts
+# they count the items that were actually fetched.
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+import make_corpus
+from stub_servers import NetworkProfile, StubHTTPServer, StubFTPServer, serve_in_background
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEASURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "measure.py")
+
+# corpus sizes; a run is only comparable with runs of the same size
+SIZES = {
+    "small": {"items": 20, "mutations": 20, "package_kb": 256, "compare_rows": 200, "table_rows": 20000},
+    "medium": {"items": 100, "mutations": 50, "package_kb": 1024, "compare_rows": 1000, "table_rows": 200000},
+    "large": {"items": 500, "mutations": 100, "package_kb": 4096, "compare_rows": 5000, "table_rows": 1000000},
+}
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the throughput benchmarks against local stand-in servers")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small", help="Corpus size preset")
+    parser.add_argument("--only", nargs="+", help="Run only the benchmarks whose name starts with one of these")
+    parser.add_argument("--work-dir", default=None, help="Directory for the corpus and outputs (default: a temporary directory); an existing corpus of the same size is reused")
+    parser.add_argument("--out", default=None, help="JSON file to write the results to (default: benchmark-<size>-<timestamp>.json)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency added to every stand-in response")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="Stand-in bandwidth per connection in MB/s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500/550 reply from the stand-ins")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 reply from the HTTP stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", metavar="BASELINE", help="Print the change of each benchmark against an earlier results file")
+    return parser.parse_args()
+
+
+def build_corpus(corpus_dir: str, size: dict, seed: int) -> None:
+    marker = os.path.join(corpus_dir, "corpus.json")
+    settings = dict(size, seed=seed)
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == settings:
+                print(f"Reusing corpus in {corpus_dir}")
+                return
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    os.makedirs(corpus_dir)
+    start = time.time()
+    pairs = make_corpus.ids(size["items"])
+    pmids = [pmid for pmid, _ in pairs]
+    fixtures = os.path.join(corpus_dir, "fixtures")
+    make_corpus.write_id_csv(os.path.join(corpus_dir, "ids.csv"), pairs)
+    make_corpus.write_pmc_fixtures(fixtures, pairs, size["package_kb"], seed)
+    make_corpus.write_pubtator_fixtures(fixtures, pairs, size["mutations"], seed)
+    make_corpus.write_bioc_xml(os.path.join(corpus_dir, "collection.xml"), pmids, size["mutations"], seed)
+    make_corpus.write_bioc_json(os.path.join(corpus_dir, "collection.json"), pmids, size["mutations"], seed)
+    make_corpus.write_mutation_csvs(corpus_dir, pmids[0], size["compare_rows"], seed=seed)
+    make_corpus.write_xlsx(os.path.join(corpus_dir, "table.xlsx"), size["table_rows"], seed)
+    make_corpus.write_tsv(os.path.join(corpus_dir, "table.tsv"), size["table_rows"], seed)
+    with open(marker, "w") as f:
+        json.dump(settings, f)
+    print(f"Corpus generated in {time.time() - start:.1f}s")
+
+
+def dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def count_downloads(out_dir: str, fixture_dir: str):
+    """
+    (items, bytes) a download benchmark actually fetched: the files in out_dir as
+    large as the fixture of the same name. with --ignore-errors the scripts skip
+    the items that failed, and a failed ftp download leaves a partial file.
+    """
+    fixtures = {f: os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(fixture_dir) for f in files}
+    items = n_bytes = 0
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            path = os.path.join(out_dir, name)
+            if os.path.isfile(path) and fixtures.get(name) == os.path.getsize(path):
+                items += 1
+                n_bytes += fixtures[name]
+    return items, n_bytes
+
+
+def benchmarks(corpus: str, out: str, size: dict):
+    """
+    (name, command, items, input bytes, count) for every benchmark. input bytes
+    are what the script has to read or download, so MB/s is comparable between
+    network and local benchmarks. count, for the download and NER benchmarks,
+    returns the (items, bytes) that were fetched after the run; the local
+    scripts either process their whole input or exit with an error.
+    """
+    py = sys.executable
+    items = size["items"]
+    ids = os.path.join(corpus, "ids.csv")
+    fixtures = os.path.join(corpus, "fixtures")
+    n_mutations = items * size["mutations"]
+    rows = size["table_rows"]
+    xlsx = os.path.join(corpus, "table.xlsx")
+    tsv = os.path.join(corpus, "table.tsv")
+    tmvar_csv = os.path.join(corpus, f"{make_corpus.ids(1)[0][0]}.xml.csv")
+    bionext_csv = os.path.join(corpus, f"{make_corpus.ids(1)[0][0]}.bionext.csv")
+    return [
+        ("get-data-ftp", [py, "get-data-v0.1.py", "-i", ids, "-o", os.path.join(out, "ftp"), "-c", "1", "--ignore-errors"],
+         items, dir_size(os.path.join(fixtures, "ftp")),
+         lambda: count_downloads(os.path.join(out, "ftp"), os.path.join(fixtures, "ftp"))),
+        ("get-data-europepmc", [py, "get-data-v0.1.py", "-i", ids, "-o", os.path.join(out, "europepmc"), "-c", "2", "--ignore-errors"],
+         items, dir_size(os.path.join(fixtures, "europepmc")),
+         lambda: count_downloads(os.path.join(out, "europepmc"), os.path.join(fixtures, "europepmc"))),
+        ("run-ner-tmVar3", [py, "run-ner-v0.1.py", "-i", ids, "-o", os.path.join(out, "tmVar3"), "--tool", "tmVar3", "--ignore-errors"],
+         items, dir_size(os.path.join(fixtures, "pubtator")),
+         lambda: count_downloads(os.path.join(out, "tmVar3"), os.path.join(fixtures, "pubtator"))),
+        ("extract-mutations-tmVar3", [py, "extract-mutations.py", "--file", os.path.join(corpus, "collection.xml"), "--format", "tmVar3",
+                                      "--out", os.path.join(out, "tmVar3.csv")],
+         n_mutations, os.path.getsize(os.path.join(corpus, "collection.xml")), None),
+        ("extract-mutations-bionext", [py, "extract-mutations.py", "--file", os.path.join(corpus, "collection.json"), "--format", "bionext",
+                                       "--out", os.path.join(out, "bionext.csv")],
+         n_mutations, os.path.getsize(os.path.join(corpus, "collection.json")), None),
+        ("compare-mutations", [py, "compare-mutations.py", "--tmvar", tmvar_csv, "--bionext", bionext_csv, "--out", os.path.join(out, "compare")],
+         2 * size["compare_rows"], os.path.getsize(tmvar_csv) + os.path.getsize(bionext_csv), None),
+        ("extract-info-excel-xml", [py, "extract-info-xls-gem.py", "-f", xlsx, "-t", "excel", "--no-cache"],
+         rows, os.path.getsize(xlsx), None),
+        ("extract-info-excel-stream", [py, "extract-info-xls-gem.py", "-f", xlsx, "-t", "excel", "--no-cache", "--stream"],
+         rows, os.path.getsize(xlsx), None),
+        ("extract-info-excel-search", [py, "extract-info-xls-gem.py", "-f", xlsx, "-t", "excel", "--no-cache", "-s", "gyrA"],
+         rows, os.path.getsize(xlsx), None),
+        ("extract-info-tsv-xml", [py, "extract-info-xls-gem.py", "-f", tsv, "-t", "tsv", "--no-cache"],
+         rows, os.path.getsize(tsv), None),
+        ("extract-info-tsv-chunked-xml", [py, "extract-info-xls-gem.py", "-f", tsv, "-t", "tsv", "--chunksize", "20000"],
+         rows, os.path.getsize(tsv), None),
+        ("extract-info-tsv-chunked-search", [py, "extract-info-xls-gem.py", "-f", tsv, "-t", "tsv", "--chunksize", "20000", "-s", "gyrA"],
+         rows, os.path.getsize(tsv), None),
+    ]
+
+
+def run_child(command, env, log_path: str):
+    # run one benchmark script under measure.py, which reports the script's own peak RSS
+    rss_path = f"{log_path}.rss"
+    if os.path.exists(rss_path):
+        os.remove(rss_path)
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([command[0], MEASURE, rss_path] + command[1:], cwd=REPO_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=log)
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    peak_rss = 0.0
+    if os.path.exists(rss_path):
+        with open(rss_path) as f:
+            peak_rss = float(f.read())
+    return proc.returncode, elapsed, usage.ru_utime + usage.ru_stime, peak_rss
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare_results(baseline_path: str, results: dict) -> None:
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"\nChange against {baseline_path}:")
+    for r in results["results"]:
+        old = baseline.get(r["name"])
+        if not old or not old.get("items_per_s") or r["items_per_s"] is None:
+            continue  # failed runs have no rate
+        speed = r["items_per_s"] / old["items_per_s"] - 1
+        memory = r["peak_rss_mb"] / old["peak_rss_mb"] - 1 if old["peak_rss_mb"] else 0
+        print(f"{r['name']:<34} items/s {speed:+7.1%}   peak RSS {memory:+7.1%}")
+
+
+def main():
+    args = parse_args()
+    size = SIZES[args.size]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="curate-bench-")
+    corpus = os.path.join(work_dir, f"corpus-{args.size}")
+    build_corpus(corpus, size, args.seed)
+
+    profile = NetworkProfile(args.latency, args.bandwidth * 1e6, args.error_rate, args.rate_429, args.seed)
+    http = serve_in_background(StubHTTPServer(os.path.join(corpus, "fixtures"), profile))
+    ftp = serve_in_background(StubFTPServer(os.path.join(corpus, "fixtures", "ftp"), profile))
+    env = dict(
+        os.environ,
+        PMC_OA_URL=f"{http.url}/pmc/utils/oa/oa.fcgi",
+        EUROPEPMC_URL=f"{http.url}/europepmc/webservices/rest",
+        PUBTATOR_URL=f"{http.url}/research/pubtator3-api",
+        PMC_FTP_HOST=ftp.server_address[0],
+        PMC_FTP_PORT=str(ftp.server_address[1]),
+    )
+
+    results = []
+    print(f"{'benchmark':<34}{'status':>7}{'seconds':>9}{'items/s':>11}{'MB/s':>9}{'peak MB':>9}")
+    for name, command, items, n_bytes, count in benchmarks(corpus, os.path.join(work_dir, "out"), size):
+        if args.only and not name.startswith(tuple(args.only)):
+            continue
+        out_dir = os.path.join(work_dir, "out")
+        shutil.rmtree(out_dir, ignore_errors=True)  # downloads skip existing files, always start empty
+        os.makedirs(out_dir)
+        status, elapsed, cpu, peak_rss = run_child(command, env, os.path.join(work_dir, f"{name}.log"))
+        done_items, done_bytes = count() if count else (items, n_bytes)
+        ok = status == 0
+        result = {
+            "name": name,
+            "command": command[1:],
+            "status": status,
+            "items": done_items,
+            "items_planned": items,
+            "bytes": done_bytes,
+            "seconds": round(elapsed, 4),
+            "cpu_seconds": round(cpu, 4),
+            "items_per_s": round(done_items / elapsed, 3) if ok else None,
+            "mb_per_s": round(done_bytes / elapsed / 1e6, 3) if ok else None,
+            "peak_rss_mb": round(peak_rss, 1),
+        }
+        results.append(result)
+        rates = f"{result['items_per_s']:>11.1f}{result['mb_per_s']:>9.2f}" if ok else f"{'-':>11}{'-':>9}"
+        print(f"{name:<34}{status:>7}{elapsed:>9.2f}{rates}{peak_rss:>9.1f}")
+        if not ok:
+            print(f"  failed, see {os.path.join(work_dir, name + '.log')}")
+        elif done_items < items:
+            print(f"  only {done_items} of {items} items, see {os.path.join(work_dir, name + '.log')}")
+
+    http.shutdown()
+    ftp.shutdown()
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "size": args.size,
+        "corpus": dict(size, seed=args.seed),
+        "network": {"latency": args.latency, "bandwidth_mb_s": args.bandwidth, "error_rate": args.error_rate,
+                    "rate_429": args.rate_429, "http_requests": http.requests,
+                    "http_bytes": http.bytes_sent, "ftp_bytes": ftp.bytes_sent},
+        "results": results,
+    }
+    out_path = args.out or f"benchmark-{args.size}-{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {out_path}")
+    if args.compare:
+        compare_results(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
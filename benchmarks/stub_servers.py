@@ -0,0 +1,219 @@
+# file: stub_servers.py
+# local stand-ins for the remote services used by get-data-v0.1.py and
+# run-ner-v0.1.py. they replay responses from a fixture directory:
+#   <fixtures>/oa/<PMCID>.xml            PMC OA web service (oa.fcgi?id=...)
+#   <fixtures>/europepmc/<PMCID>.zip     EuropePMC <PMCID>/supplementaryFiles
+#   <fixtures>/pubtator/<PMID>.xml       PubTator3 publications/export/biocxml
+#   <fixtures>/ftp/...                   the /pub/pmc tree of the NCBI ftp server
+# fixtures can be recorded from the real services or generated with
+# make_corpus.py. latency, bandwidth, error rate and 429 injection are set per
+# server through NetworkProfile.
+import os
+import time
+import socket
+import random
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CHUNK = 64 * 1024
+
+
+class NetworkProfile:
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0, error_rate: float = 0.0,
+                 rate_429: float = 0.0, seed: int = 0):
+        self.latency = latency          # seconds added before every response
+        self.bandwidth = bandwidth      # bytes/s per connection, 0 = unlimited
+        self.error_rate = error_rate    # probability of a 500 (HTTP) or 550 (ftp) reply
+        self.rate_429 = rate_429        # probability of a 429 Too Many Requests reply (HTTP only)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self) -> float:
+        with self.lock:
+            return self.random.random()
+
+    def send(self, write, data: bytes) -> None:
+        # write data in chunks, sleeping to honour the bandwidth limit
+        for start in range(0, len(data), CHUNK):
+            chunk = data[start:start + CHUNK]
+            write(chunk)
+            if self.bandwidth:
+                time.sleep(len(chunk) / self.bandwidth)
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    server_version = "StubService/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _fixture(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        fixtures = self.server.fixtures
+        if url.path.endswith("/oa.fcgi"):
+            return os.path.join(fixtures, "oa", f"{query.get('id', [''])[0]}.xml"), "text/xml"
+        if url.path.endswith("/supplementaryFiles"):
+            pmcid = url.path.rstrip("/").split("/")[-2]
+            return os.path.join(fixtures, "europepmc", f"{pmcid}.zip"), "application/zip"
+        if url.path.endswith("/export/biocxml"):
+            return os.path.join(fixtures, "pubtator", f"{query.get('pmids', [''])[0]}.xml"), "application/xml"
+        return None, None
+
+    def do_GET(self):
+        profile = self.server.profile
+        self.server.count_request()
+        if profile.latency:
+            time.sleep(profile.latency)
+        draw = profile.draw()
+        if draw < profile.rate_429:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if draw < profile.rate_429 + profile.error_rate:
+            self.send_error(500)
+            return
+        path, content_type = self._fixture()
+        if not path or not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        profile.send(self.wfile.write, body)
+        self.server.count_bytes(len(body))
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures: str, profile: NetworkProfile = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _ReplayHandler)
+        self.fixtures = fixtures
+        self.profile = profile or NetworkProfile()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_bytes(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+
+class _FTPHandler(socketserver.StreamRequestHandler):
+    # just enough of RFC 959 for ftplib's login/cwd/retrbinary (passive mode)
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        cwd = "/"
+        data_listener = None
+        self.reply("220 stub ftp ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                break
+            command, _, arg = raw.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if server.profile.latency:
+                time.sleep(server.profile.latency)
+            if command == "USER":
+                self.reply("331 password please")
+            elif command == "PASS":
+                self.reply("230 logged in")
+            elif command in ("TYPE", "MODE", "STRU"):
+                self.reply("200 ok")
+            elif command == "SYST":
+                self.reply("215 UNIX Type: L8")
+            elif command == "NOOP":
+                self.reply("200 ok")
+            elif command == "PWD":
+                self.reply(f'257 "{cwd}"')
+            elif command == "CWD":
+                cwd = os.path.normpath(os.path.join(cwd, arg)).replace(os.sep, "/")
+                self.reply("250 ok")
+            elif command == "PASV":
+                if data_listener:
+                    data_listener.close()
+                data_listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                data_listener.bind((self.connection.getsockname()[0], 0))
+                data_listener.listen(1)
+                host, port = data_listener.getsockname()
+                self.reply(f"227 Entering Passive Mode ({host.replace('.', ',')},{port >> 8},{port & 255})")
+            elif command in ("RETR", "SIZE"):
+                path = server.resolve(os.path.normpath(os.path.join(cwd, arg)).replace(os.sep, "/"))
+                if path is None or not os.path.isfile(path) or server.profile.draw() < server.profile.error_rate:
+                    self.reply("550 no such file")
+                    continue
+                if command == "SIZE":
+                    self.reply(f"213 {os.path.getsize(path)}")
+                    continue
+                if data_listener is None:
+                    self.reply("425 use PASV first")
+                    continue
+                self.reply("150 opening data connection")
+                conn, _ = data_listener.accept()
+                with open(path, "rb") as f:
+                    body = f.read()
+                server.profile.send(conn.sendall, body)
+                conn.close()
+                data_listener.close()
+                data_listener = None
+                server.count_bytes(len(body))
+                self.reply("226 transfer complete")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                break
+            else:
+                self.reply("502 not implemented")
+        if data_listener:
+            data_listener.close()
+
+
+class StubFTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root: str, profile: NetworkProfile = None, host: str = "127.0.0.1", port: int = 0,
+                 mount: str = "/pub/pmc"):
+        super().__init__((host, port), _FTPHandler)
+        self.root = root
+        self.mount = mount
+        self.profile = profile or NetworkProfile()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def resolve(self, ftp_path: str):
+        # map an absolute ftp path below the mount point to a file in root
+        if not (ftp_path + "/").startswith(self.mount + "/"):
+            return None
+        rel = ftp_path[len(self.mount):].lstrip("/")
+        path = os.path.normpath(os.path.join(self.root, rel))
+        return path if os.path.commonpath([os.path.abspath(self.root), os.path.abspath(path)]) == os.path.abspath(self.root) else None
+
+    def count_bytes(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+
+def serve_in_background(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -4,6 +4,7 @@ import pandas as pd
 from rapidfuzz import fuzz
 from pathlib import Path
 import re
+import tracing
 
 # Amino acid mappings
 AA_1TO3 = {
@@ -51,13 +52,15 @@ def load_tmvar_csv(path: str):
     pmid = Path(path).stem.replace(".xml", "").replace(".txt", "")
     df = pd.read_csv(path)
     df["pmid"] = pmid
-    df["normalized"] = df["text"].apply(normalize_mutation)
+    with tracing.span("normalize_mutation", file=path, rows=len(df)):
+        df["normalized"] = df["text"].apply(normalize_mutation)
     return df[["pmid", "text", "normalized", "offset"]].astype(str)
 
 
 def load_bionext_csv(path: str):
     df = pd.read_csv(path)
-    df["normalized"] = df["text"].apply(normalize_mutation)
+    with tracing.span("normalize_mutation", file=path, rows=len(df)):
+        df["normalized"] = df["text"].apply(normalize_mutation)
     return df[["pmid", "text", "normalized", "offset"]].astype(str)
 
 
@@ -109,12 +112,15 @@ if __name__ == "__main__":
     parser.add_argument("--bionext", required=True, help="CSV file from BioNext")
     parser.add_argument("--threshold", type=int, default=85, help="Fuzzy match threshold")
     parser.add_argument("--out", help="Optional output prefix for TP/FP/FN CSVs")
+    tracing.add_arguments(parser)
     args = parser.parse_args()
+    tracing.setup(args)
 
     tmvar_df = load_tmvar_csv(args.tmvar)
     bionext_df = load_bionext_csv(args.bionext)
 
-    tp, fp, fn = compare_mutations(tmvar_df, bionext_df, args.threshold)
+    with tracing.span("compare_mutations", tmvar=len(tmvar_df), bionext=len(bionext_df)):
+        tp, fp, fn = compare_mutations(tmvar_df, bionext_df, args.threshold)
 
     print(f"True positives: {len(tp)}")
     print(f"False positives (BioNext only): {len(fp)}")
@@ -1,19 +1,28 @@
-import pandas as pd
-import numpy as np
+# pandas, numpy, pyexcel, minidom and the sheet cache (pyarrow) are imported in
+# the functions that use them, so a call only pays for the parsers it needs
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from collections import OrderedDict
 import argparse
+import itertools
 import json
+import os
 import re
-from pathlib import Path
-from openpyxl import load_workbook
-import xlrd
-import pyexcel
-import pandas as pd
+import signal
+import stat
+import sys
+import threading
+import socketserver
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import tracing
+
+# part of the parsed-sheet cache key (after the parser's own version); bump when parsing changes what is stored
+EXCEL_PARSER_VERSION = "records-1"
+TSV_PARSER_VERSION = "read_csv-1"
+OCR_PARSER_VERSION = "ocr-aligned-1"
 
 
 def prettify_xml(elem):
+    from xml.dom import minidom
     rough_string = ET.tostring(elem, 'utf-8')
     reparsed = minidom.parseString(rough_string)
     return reparsed.toprettyxml(indent="  ")
@@ -21,6 +30,8 @@ def prettify_xml(elem):
 
 
 def reconstruct_table_from_ocr(ocr_data, y_threshold=15):
+    import numpy as np
+    import pandas as pd
     try:
         texts = ocr_data['res']['rec_texts']
         boxes = ocr_data['res']['rec_polys']
@@ -71,7 +82,101 @@ def reconstruct_table_from_ocr(ocr_data, y_threshold=15):
 
 
 
+def _ocr_box_extents(boxes):
+    # (n, k, 2) polygons or (n, 4) [x0, y0, x1, y1] boxes -> x0, x1, y0, y1 arrays
+    import numpy as np
+    boxes = np.asarray(boxes, dtype=float)
+    if boxes.ndim == 2 and boxes.shape[1] == 4:
+        return boxes[:, 0], boxes[:, 2], boxes[:, 1], boxes[:, 3]
+    pts = boxes.reshape(len(boxes), -1, 2)
+    return pts[:, :, 0].min(axis=1), pts[:, :, 0].max(axis=1), pts[:, :, 1].min(axis=1), pts[:, :, 1].max(axis=1)
+
+
+
+def reconstruct_table_from_ocr_aligned(ocr_data, row_tolerance=0.5, column_gap=0.5):
+    """
+    rebuild a table from PaddleOCR output without dropping sparse rows.
+    box centers are clustered into rows by sorting on y and splitting where the
+    gap exceeds row_tolerance * the median glyph height. header boxes closer than
+    column_gap * glyph height are merged into one column, and every data cell is
+    assigned to the header column it overlaps most in x (or the nearest one), so
+    missing cells become NaN instead of the whole row being skipped.
+    """
+    import numpy as np
+    import pandas as pd
+    try:
+        texts = ocr_data['res']['rec_texts']
+        boxes = ocr_data['res']['rec_polys']
+
+        if not texts or len(boxes) == 0:
+            print("OCR data is empty or malformed. Cannot reconstruct table.")
+            return pd.DataFrame()
+
+        x0, x1, y0, y1 = _ocr_box_extents(boxes)
+        glyph = np.median(y1 - y0)
+        if not glyph > 0:
+            glyph = 1.0
+
+        # rows: single-linkage on the sorted y centers, O(n log n)
+        yc = (y0 + y1) / 2
+        order = np.argsort(yc, kind='stable')
+        row_of = np.empty(len(texts), dtype=int)
+        row_of[order] = np.concatenate(([0], np.cumsum(np.diff(yc[order]) > row_tolerance * glyph)))
+
+        # columns: header boxes left to right, merging the pieces of one split header
+        header = np.flatnonzero(row_of == 0)
+        header = header[np.argsort(x0[header], kind='stable')]
+        starts = np.concatenate(([True], x0[header][1:] - np.maximum.accumulate(x1[header])[:-1] > column_gap * glyph))
+        col_of_header = np.cumsum(starts) - 1
+        n_cols = col_of_header[-1] + 1
+        col_x0 = np.minimum.reduceat(x0[header], np.flatnonzero(starts))
+        col_x1 = np.maximum.reduceat(x1[header], np.flatnonzero(starts))
+        header_texts = ['_'.join(texts[i] for i in header[col_of_header == c]).replace(' ', '_') for c in range(n_cols)]
+
+        # cells: largest x-overlap with a column, nearest column center if none overlaps
+        cells = np.flatnonzero(row_of > 0)
+        overlap = np.minimum(x1[cells, None], col_x1[None, :]) - np.maximum(x0[cells, None], col_x0[None, :])
+        nearest = np.abs((x0[cells, None] + x1[cells, None]) / 2 - (col_x0 + col_x1)[None, :] / 2).argmin(axis=1)
+        col_of = np.where(overlap.max(axis=1) > 0, overlap.argmax(axis=1), nearest)
+
+        n_rows = row_of.max()
+        table = np.full((n_rows, n_cols), None, dtype=object)
+        for i in np.lexsort((x0[cells], col_of, row_of[cells])):
+            r, c, text = row_of[cells[i]] - 1, col_of[i], texts[cells[i]]
+            table[r, c] = text if table[r, c] is None else f"{table[r, c]} {text}"
+        table[np.equal(table, None)] = np.nan
+
+        return pd.DataFrame(table, columns=header_texts)
+
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        print(f"Error processing OCR data: {e}. Check the dictionary structure.")
+        return pd.DataFrame()
+
+
+
+def reconstruct_tables_from_ocr(ocr_batch, **kwargs):
+    # reconstruct a batch of OCR results, given as dicts or paths to the JSON files
+    tables = []
+    for ocr_data in ocr_batch:
+        if not isinstance(ocr_data, dict):
+            with open(ocr_data, 'r') as f:
+                ocr_data = json.load(f)
+        tables.append(reconstruct_table_from_ocr_aligned(ocr_data, **kwargs))
+    return tables
+
+
+
+def clean_column_name(col_name):
+    clean_col_name = re.sub(r'[:*]', '_', str(col_name))
+    clean_col_name = re.sub(r'[^a-zA-Z0-9_]', '', clean_col_name)
+    if not clean_col_name or clean_col_name[0].isdigit():
+        clean_col_name = '_' + clean_col_name
+    return clean_col_name
+
+
+
 def convert_to_xml(df, root_name, row_name, sheet_name=None, metadata_rows=None):
+    import pandas as pd
     if df.empty:
         return None
 
@@ -92,14 +197,11 @@ def convert_to_xml(df, root_name, row_name, sheet_name=None, metadata_rows=None)
             meta_element = ET.SubElement(parent_element, tag)
             meta_element.text = " | ".join(text_values)
 
+    clean_col_names = [clean_column_name(col_name) for col_name in df.columns]
     for _, row in df.iterrows():
         entry_element = ET.SubElement(parent_element, row_name)
-        for col_name, value in row.items():
+        for clean_col_name, value in zip(clean_col_names, row.values):
             if pd.notna(value):
-                clean_col_name = re.sub(r'[:*]', '_', str(col_name))
-                clean_col_name = re.sub(r'[^a-zA-Z0-9_]', '', clean_col_name)
-                if not clean_col_name or clean_col_name[0].isdigit():
-                    clean_col_name = '_' + clean_col_name
                 sub_element = ET.SubElement(entry_element, clean_col_name)
                 sub_element.text = str(value)
 
@@ -107,6 +209,98 @@ def convert_to_xml(df, root_name, row_name, sheet_name=None, metadata_rows=None)
 
 
 
+def _escape_xml(text):
+    # same escaping as the minidom round-trip in prettify_xml
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+
+def _write_xml_element(out, indent, tag, text):
+    if text:
+        # the XML parser in prettify_xml normalizes line endings of element text
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        out.write(f"{indent}<{tag}>{_escape_xml(text)}</{tag}>\n")
+    else:
+        out.write(f"{indent}<{tag}/>\n")
+
+
+
+def write_xml_stream(tables, out, root_name='bacterial_mutations_data', row_name='mutation_entry', chunk_size=1024):
+    """
+    write (sheet_name, df, metadata_rows) tables as XML to the file object out,
+    one <row_name> element at a time. the output is identical to
+    prettify_xml() of the tree convert_to_xml() would build, but only one chunk
+    of rows is held in memory besides the input frames.
+    """
+    import pandas as pd
+    out.write('<?xml version="1.0" ?>\n')
+    root_open = False
+    for sheet_name, df, metadata_rows in tables:
+        # df may also be an iterator of chunks of one sheet (see iter_tsv_chunks)
+        frames = (frame for frame in ([df] if isinstance(df, pd.DataFrame) else df) if not frame.empty)
+        df = next(frames, None)
+        if df is None:
+            continue
+        if not root_open:
+            out.write(f"<{root_name}>\n")
+            root_open = True
+
+        indent = '  '
+        if sheet_name:
+            out.write(f'{indent}<sheet name="{_escape_xml(str(sheet_name))}">\n')
+            indent += '  '
+
+        if metadata_rows:
+            for i, (_, values) in enumerate(metadata_rows):
+                text_values = [v for v in values if v]
+                if not text_values:
+                    continue
+                tag = "title" if i == 0 else f"subtitle{i}"
+                _write_xml_element(out, indent, tag, " | ".join(text_values))
+
+        clean_col_names = [clean_column_name(col_name) for col_name in df.columns]
+        for frame in itertools.chain([df], frames):
+            # .to_numpy() on a slice upcasts like df.iterrows() does, so values print the same
+            for start in range(0, len(frame), chunk_size):
+                for values in frame.iloc[start:start + chunk_size].to_numpy():
+                    cells = [(name, value) for name, value in zip(clean_col_names, values) if pd.notna(value)]
+                    if not cells:
+                        out.write(f"{indent}<{row_name}/>\n")
+                        continue
+                    out.write(f"{indent}<{row_name}>\n")
+                    for name, value in cells:
+                        _write_xml_element(out, indent + '  ', name, str(value))
+                    out.write(f"{indent}</{row_name}>\n")
+
+        if sheet_name:
+            out.write("  </sheet>\n")
+
+    out.write(f"</{root_name}>\n" if root_open else f"<{root_name}/>\n")
+
+
+
+def _search_phrases(search_phrase):
+    # normalize: allow a single string OR a list of phrases
+    return [search_phrase.lower()] if isinstance(search_phrase, str) else [p.lower() for p in search_phrase]
+
+
+
+def _filter_frame(df, phrases):
+    # rows of df with a cell whose lowercased text matches any of the phrases (as
+    # regular expressions, like Series.str.contains). the cells are the row-wise
+    # upcast values df.apply(..., axis=1) would see, matched one column at a time;
+    # plain re is used as pandas' .str methods need several copies of each column
+    import numpy as np
+    patterns = [re.compile(phrase) for phrase in phrases]
+    mask = np.zeros(len(df), dtype=bool)
+    for column in df.to_numpy().T:
+        lowered = [str(value).lower() for value in column]
+        for pattern in patterns:
+            mask |= np.fromiter((pattern.search(text) is not None for text in lowered), dtype=bool, count=len(lowered))
+    return df[mask]
+
+
+
 def search_records(records, phrase):
     phrase = phrase.lower()
     results = []
@@ -120,67 +314,243 @@ def search_records(records, phrase):
 
 
 
-def convert_data_to_xml_seamless(data, input_type, search_phrase=None):
+def _iter_xml_tables(dfs):
+    import pandas as pd
+    for sheet_name, df_data in dfs.items():
+        if isinstance(df_data, tuple):
+            df, metadata_rows = df_data
+        else:
+            df, metadata_rows = df_data, None
+
+        # Convert records (list of dicts) into DataFrame for XML converter
+        if isinstance(df, list):
+            df = pd.DataFrame(df)
+
+        yield sheet_name, df, metadata_rows[:-1] if metadata_rows else None
+
+
+
+
+def read_excel_records(data, cache=None):
+    # [(sheet_name, records)] for every sheet of a workbook, from the cache if it has them
+    import pyexcel
+    from sheet_cache import records_to_sheet, sheet_to_records
+    key = cache.key(data, f"pyexcel-{pyexcel.__version__}:{EXCEL_PARSER_VERSION}") if cache else None
+    sheets = cache.get(key) if cache else None
+    if sheets is not None:
+        return [(sheet[0], sheet_to_records(sheet)) for sheet in sheets]
+
+    with tracing.span("pyexcel_parse", file=data):
+        wb = pyexcel.get_book(file_name=data)
+        sheets = []
+        for sheet in wb:
+            if sheet.number_of_rows() > 0:
+                sheet.name_columns_by_row(0)
+                sheets.append((sheet.name, list(sheet.to_records())))
+            else:
+                sheets.append((sheet.name, []))
+        pyexcel.free_resources()
+    if cache:
+        cache.put(key, [records_to_sheet(name, records) for name, records in sheets], source=data)
+    return sheets
+
+
+
+def read_tsv(data, cache=None):
+    import pandas as pd
+    from sheet_cache import frame_to_sheet
+    key = cache.key(data, f"pandas-{pd.__version__}:{TSV_PARSER_VERSION}") if cache else None
+    frames = cache.get_frames(key) if cache else None
+    if frames is not None:
+        return frames[0][1]
+
+    with tracing.span("read_csv", file=data):
+        df = pd.read_csv(data, sep='\t')
+    if cache:
+        cache.put(key, [frame_to_sheet('mutations', df)], source=data)
+    return df
+
+
+
+def iter_tsv_chunks(data, chunksize):
+    """
+    read a TSV file as frames of at most chunksize rows. a first pass collects
+    the dtype every chunk infers per column, and the columns whose dtype differs
+    between chunks are then read with the dtype pd.read_csv gives the whole file,
+    so the values of every chunk print the same as those of the full frame:
+    - integer in some chunks and float in others (gaps in a number column): float
+    - text in some chunks and numbers or booleans in others (chromosomes 1..22,
+      then X): str
+    """
+    import pandas as pd
+    kinds = OrderedDict()
+    with tracing.span("read_csv_dtypes", file=data):
+        with pd.read_csv(data, sep='\t', chunksize=chunksize) as reader:
+            for chunk in reader:
+                for column, dtype in chunk.dtypes.items():
+                    kind = dtype.kind
+                    if kind == 'O' and pd.api.types.infer_dtype(chunk[column], skipna=True) == 'boolean':
+                        kind = 'b'  # True/False with gaps, not text
+                    kinds.setdefault(column, set()).add(kind)
+    dtypes = {}
+    for column, k in kinds.items():
+        if 'O' in k and len(k) > 1:
+            # pandas itself gives a mixed int/str column (DtypeWarning) for a file
+            # larger than its internal parser buffer; read as text it is consistent
+            dtypes[column] = str
+        elif 'f' in k and k <= {'i', 'u', 'f'}:
+            dtypes[column] = 'float64'
+    with pd.read_csv(data, sep='\t', chunksize=chunksize, dtype=dtypes) as reader:
+        yield from reader
+
+
+
+def search_tsv_chunks(data, search_phrase, out, chunksize):
+    """
+    write the records of a TSV file matching search_phrase to out, one chunk at
+    a time. the text is what printing the list returned for a whole-file search
+    gives, or None is returned and nothing is written if there is no match.
+    """
+    phrases = _search_phrases(search_phrase)
+    n_matches = 0
+    for chunk in iter_tsv_chunks(data, chunksize):
+        for record in _filter_frame(chunk, phrases).to_dict(orient='records'):
+            out.write(", " if n_matches else "[")
+            out.write(repr(record))
+            n_matches += 1
+    if n_matches:
+        out.write("]\n")
+    return n_matches
+
+
+
+def read_ocr_table(data, cache=None):
+    from sheet_cache import frame_to_sheet
+    key = cache.key(data, OCR_PARSER_VERSION) if cache else None
+    frames = cache.get_frames(key) if cache else None
+    if frames is not None:
+        return frames[0][1]
+
+    with open(data, 'r') as f:
+        ocr_dict = json.load(f)
+    with tracing.span("reconstruct_table_from_ocr", file=data):
+        df = reconstruct_table_from_ocr_aligned(ocr_dict)
+    if cache:
+        cache.put(key, [frame_to_sheet('ocr_table', df)], source=data)
+    return df
+
+
+
+
+class WorkbookCache:
+    """
+    in-memory LRU of parsed input files for the server, keyed by path, type,
+    mtime and size, so a file queried again is neither hashed nor parsed again.
+    cached values are shared between requests and must not be modified.
+    """
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, reader, data, input_type, cache=None):
+        stat = os.stat(data)
+        path = os.path.abspath(data)
+        key = (path, input_type, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = reader(data, cache)  # outside the lock, other files are served meanwhile
+        with self.lock:
+            for old in [k for k in self.entries if k[:2] == key[:2]]:
+                del self.entries[old]  # earlier versions of the same file
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+
+
+def _read_input(reader, data, input_type, cache, workbooks):
+    if workbooks is None:
+        return reader(data, cache)
+    return workbooks.load(reader, data, input_type, cache)
+
+
+
+def convert_data_to_xml_seamless(data, input_type, search_phrase=None, out=None, cache=None, workbooks=None, chunksize=None, verbose=True):
+    # with out (a writable text file), the XML is streamed there instead of returned;
+    # with cache (a SheetCache), parsed sheets are reused across calls;
+    # with workbooks (a WorkbookCache), parsed files are also kept in memory;
+    # with chunksize (tsv only), the file is read that many rows at a time and the
+    # matches or XML entries are written to out (default: stdout) as they are found;
+    # with verbose=False, excel search matches are only returned, not also printed
     #print(data)
 
     dfs = {}
     
     try:
-        if input_type == 'tsv':
-            df = pd.read_csv(data, sep='\t')
+        if input_type == 'tsv' and chunksize:
+            out = out or sys.stdout
+            if search_phrase:
+                with tracing.span("search_tsv_chunks", file=data):
+                    if not search_tsv_chunks(data, search_phrase, out, chunksize):
+                        return f"No matches found for '{search_phrase}'."
+                return None
+            with tracing.span("write_xml_stream"):
+                write_xml_stream([('mutations', iter_tsv_chunks(data, chunksize), None)], out)
+            return None
+
+        elif input_type == 'tsv':
+            df = _read_input(read_tsv, data, input_type, cache, workbooks)
             if search_phrase:
-                phrase = search_phrase.lower()
-                df = df[df.apply(lambda row: row.astype(str).str.lower().str.contains(phrase).any(), axis=1)]
+                df = _filter_frame(df, _search_phrases(search_phrase))
                 if df.empty:
                     return f"No matches found for '{search_phrase}'."
                 return df.to_dict(orient='records')
             dfs['mutations'] = df
 
         elif input_type == 'excel':
-            wb = pyexcel.get_book(file_name=data)
-            sheetNames = wb.sheet_names()
-            #print(sheetNames)
-
-            for sheet_name in sheetNames:
+            for sheet_name, records in _read_input(read_excel_records, data, input_type, cache, workbooks):
                 #print(sheet_name)
-                records = pyexcel.get_records(file_name=data, sheet_name=sheet_name)
  #               if search_phrase:
  #                   phrase = search_phrase.lower()
-                if search_phrase:  # normalize: allow a single string OR a list of phrases
-                    phrases = ([search_phrase.lower()] if isinstance(search_phrase, str) else [p.lower() for p in search_phrase])
-                matches = [
-                    row for row in records
-                    if any(
-                        phrase in str(v).lower()
-                        for phrase in phrases
-                        for v in row.values()
-                    )
-                ]
-                #matches = [row for row in records if any(phrase in str(v).lower() for v in row.values())]
-                if len(matches) >= 1:
-                    print(matches)
-                    dfs[sheet_name] = matches
-                #else:
-                #    dfs[sheet_name] = records
+                if search_phrase:
+                    phrases = _search_phrases(search_phrase)
+                    matches = [
+                        row for row in records
+                        if any(
+                            phrase in str(v).lower()
+                            for phrase in phrases
+                            for v in row.values()
+                        )
+                    ]
+                    #matches = [row for row in records if any(phrase in str(v).lower() for v in row.values())]
+                    if len(matches) >= 1:
+                        if verbose:
+                            print(matches)
+                        dfs[sheet_name] = matches
+                else:
+                    dfs[sheet_name] = records
             if search_phrase:
                 #print(search_phrase)
                 if not dfs:
                     return f"No matches found for '{search_phrase}'."
-                else:
+                elif verbose:
                     print(f"matches found for '{search_phrase}' in {dfs}")
                 return dfs  # return matches directly instead of XML
 
         elif input_type == 'ocr':
-            with open(data, 'r') as f:
-                ocr_dict = json.load(f)
-            df_reconstructed = reconstruct_table_from_ocr(ocr_dict)
+            df_reconstructed = _read_input(read_ocr_table, data, input_type, cache, workbooks)
 
             if not df_reconstructed.empty:
                 if search_phrase:
-                    phrase = search_phrase.lower()
-                    df_reconstructed = df_reconstructed[df_reconstructed.apply(
-                        lambda row: row.astype(str).str.lower().str.contains(phrase).any(), axis=1
-                    )]
+                    df_reconstructed = _filter_frame(df_reconstructed, _search_phrases(search_phrase))
                     if df_reconstructed.empty:
                         return f"No matches found for '{search_phrase}'."
                     return df_reconstructed.to_dict(orient='records')
@@ -198,43 +568,209 @@ def convert_data_to_xml_seamless(data, input_type, search_phrase=None):
         return "Error: No data was successfully processed."
 
     # only if no search phrase, we go into XML conversion
-    root_element = ET.Element('bacterial_mutations_data')
-    for sheet_name, df_data in dfs.items():
-        if isinstance(df_data, tuple):
-            df, metadata_rows = df_data
-        else:
-            df, metadata_rows = df_data, None
-
-        # Convert records (list of dicts) into DataFrame for XML converter
-        if isinstance(df, list):
-            df = pd.DataFrame(df)
+    if out is not None:
+        with tracing.span("write_xml_stream"):
+            write_xml_stream(_iter_xml_tables(dfs), out)
+        return None
 
+    root_element = ET.Element('bacterial_mutations_data')
+    for sheet_name, df, metadata_rows in _iter_xml_tables(dfs):
         if not df.empty:
-            xml_element = convert_to_xml(
-                df,
-                'bacterial_mutations_data',
-                'mutation_entry',
-                sheet_name=sheet_name,
-                metadata_rows=metadata_rows[:-1] if metadata_rows else None
-            )
+            with tracing.span("convert_to_xml", sheet=sheet_name, rows=len(df)):
+                xml_element = convert_to_xml(
+                    df,
+                    'bacterial_mutations_data',
+                    'mutation_entry',
+                    sheet_name=sheet_name,
+                    metadata_rows=metadata_rows
+                )
             if xml_element:
                 for child in list(xml_element):
                     root_element.append(child)
 
-    return prettify_xml(root_element)
+    with tracing.span("prettify_xml"):
+        return prettify_xml(root_element)
+
+def _jsonable(value):
+    # NaN (missing cells) becomes null, numpy scalars python numbers, anything else its text
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if hasattr(value, 'item'):
+        return _jsonable(value.item())
+    return str(value)
+
+
+
+def warm_up():
+    # import the parsers and load the xlsx reader plugin before the first request
+    import io
+    import numpy
+    import pandas
+    import pyexcel
+    import pyarrow.compute
+    import pyarrow.feather
+    from openpyxl import Workbook
+    from xml.dom import minidom
+    buf = io.BytesIO()
+    wb = Workbook()
+    wb.active.append(['warm', 'up'])
+    wb.save(buf)
+    pyexcel.get_book(file_content=buf.getvalue(), file_type='xlsx')
+    try:
+        import pyexcel_xls.xlsr
+    except ImportError:
+        pass
+
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """
+    POST /convert {"file": ..., "type": "tsv" | "excel" | "ocr"}
+    POST /search  {"file": ..., "type": ..., "search": "phrase" or ["phrase", ...]}
+    GET  /health
+    answers {"result": ...} with what convert_data_to_xml_seamless returns:
+    the XML text, the matching records, or a message.
+    """
+    server_version = "extract-info-xls/1.0"
+
+    def address_string(self):
+        # clients of a unix socket have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _reply(self, status, payload):
+        body = json.dumps(_jsonable(payload)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': f"Unknown path '{self.path}'."})
+        workbooks = self.server.workbooks
+        self._reply(200, {'status': 'ok', 'workbooks': len(workbooks.entries), 'hits': workbooks.hits, 'misses': workbooks.misses})
+
+    def do_POST(self):
+        if self.path not in ('/convert', '/search'):
+            return self._reply(404, {'error': f"Unknown path '{self.path}'."})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            data, input_type = request['file'], request['type']
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply(400, {'error': f"Bad request: {e}"})
+        if not isinstance(data, str) or not isinstance(input_type, str):
+            return self._reply(400, {'error': "Bad request: 'file' and 'type' must be strings."})
+        search_phrase = request.get('search') if self.path == '/search' else None
+        if self.path == '/search' and not search_phrase:
+            return self._reply(400, {'error': "Bad request: 'search' is required."})
+        if search_phrase and not (isinstance(search_phrase, str) or
+                                  (isinstance(search_phrase, list) and all(isinstance(p, str) for p in search_phrase))):
+            return self._reply(400, {'error': "Bad request: 'search' must be a string or a list of strings."})
+        with tracing.span("query", path=self.path, file=data, type=input_type):
+            result = convert_data_to_xml_seamless(data, input_type, search_phrase=search_phrase,
+                                                  cache=self.server.sheet_cache, workbooks=self.server.workbooks, verbose=False)
+        self._reply(200, {'result': result})
+
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+
+def serve(address, cache=None, workbook_cache_size=32, quiet=False):
+    """
+    answer convert/search requests on address ('host:port' or 'unix:/path/to/socket')
+    until interrupted, one thread per request. the parsers stay imported and the
+    most recently used files stay parsed in memory between requests.
+    """
+    with tracing.span("warm_up"):
+        warm_up()
+    socket_path = address[len('unix:'):] if address.startswith('unix:') else None
+    if socket_path:
+        if os.path.exists(socket_path) and stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            os.remove(socket_path)  # left over from a previous run
+        server = _ThreadingUnixHTTPServer(socket_path, _QueryHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _QueryHandler)
+    server.sheet_cache = cache
+    server.workbooks = WorkbookCache(workbook_cache_size)
+    server.quiet = quiet
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # clean up the socket on kill too
+    print(f"Serving on {address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
 
 
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert tabular data from various formats to XML.")
-    parser.add_argument('-f', '--file', required=True, help="Path to the input file (e.g., .tsv, .xlsx, or .json for OCR data).")
-    parser.add_argument('-t', '--type', choices=['tsv', 'excel', 'ocr'], required=True, help="Format of the input data.")
+    parser.add_argument('-f', '--file', required=False, help="Path to the input file (e.g., .tsv, .xlsx, or .json for OCR data).")
+    parser.add_argument('-t', '--type', choices=['tsv', 'excel', 'ocr'], required=False, help="Format of the input data.")
     parser.add_argument(
         '-s', '--search', required=False, nargs="+",
         help="Optional phrase to search for in the data. If set, XML is not generated."
     )
+    parser.add_argument('--stream', action='store_true', help="Write XML entries incrementally instead of building the whole document in memory.")
+    parser.add_argument('-o', '--output', required=False, help="With --stream or --chunksize, file to write the output to (default: stdout).")
+    parser.add_argument('--chunksize', type=int, default=None, help="Read tsv input this many rows at a time and write matches or XML entries as they are found, so memory depends on the chunk size, not the file size.")
+    parser.add_argument('--cache-dir', default=None, help="Directory of the parsed-sheet cache (default: ~/.cache/curateMVIKG/sheets).")
+    parser.add_argument('--cache-size', type=int, default=2048, help="Size limit of the parsed-sheet cache in MB.")
+    parser.add_argument('--no-cache', action='store_true', help="Always parse the input file, without reading or filling the cache.")
+    parser.add_argument('--serve', metavar='ADDRESS', help="Run as a query service on 'host:port' or 'unix:/path/to/socket' instead of processing one file.")
+    parser.add_argument('--workbook-cache', type=int, default=32, help="With --serve, number of parsed files kept in memory.")
+    parser.add_argument('--quiet', action='store_true', help="With --serve, do not log every request.")
+    tracing.add_arguments(parser)
     args = parser.parse_args()
-    outputAnyKind = convert_data_to_xml_seamless(args.file, args.type, search_phrase=args.search)
-    print(outputAnyKind)
+    if not args.serve and not (args.file and args.type):
+        parser.error("the following arguments are required: -f/--file, -t/--type (or --serve)")
+    if args.chunksize and args.type != 'tsv':
+        parser.error("--chunksize is only supported for tsv input")
+    tracing.setup(args)
+    cache = None
+    if not args.no_cache and not args.chunksize:  # the parsed-sheet cache holds whole files
+        from sheet_cache import SheetCache, DEFAULT_CACHE_DIR
+        cache = SheetCache(args.cache_dir or DEFAULT_CACHE_DIR, args.cache_size * 1024 * 1024)
+    if args.serve:
+        serve(args.serve, cache, args.workbook_cache, args.quiet)
+    elif args.chunksize:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            outputAnyKind = convert_data_to_xml_seamless(args.file, args.type, search_phrase=args.search, out=out, chunksize=args.chunksize)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if outputAnyKind is not None:
+            print(outputAnyKind)
+    elif args.stream and not args.search:
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            outputAnyKind = convert_data_to_xml_seamless(args.file, args.type, out=out, cache=cache)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if outputAnyKind is not None:
+            print(outputAnyKind)
+    else:
+        outputAnyKind = convert_data_to_xml_seamless(args.file, args.type, search_phrase=args.search, cache=cache)
+        print(outputAnyKind)
 
@@ -4,6 +4,7 @@ import json
 import argparse
 import csv
 from typing import List, Dict
+import tracing
 
 
 def extract_mutations_tmVar3(file_path: str) -> List[Dict]:
@@ -77,16 +78,20 @@ if __name__ == "__main__":
     parser.add_argument("--file", required=True, help="Path to BioC XML file")
     parser.add_argument("--format", required=True, choices=["tmVar3", "bionext"],help="Input format: 'tmVar3' (DNA /Protein mutation) or 'bionext' (SequenceVariant)")
     parser.add_argument("--out", help="Optional output CSV file")
+    tracing.add_arguments(parser)
 
     args = parser.parse_args()
-    if args.format == "tmVar3":
-        mutations = extract_mutations_tmVar3(args.file)
-    else:
-        mutations = extract_mutations_bionext(args.file)
+    tracing.setup(args)
+    with tracing.span(f"extract_{args.format}", file=args.file):
+        if args.format == "tmVar3":
+            mutations = extract_mutations_tmVar3(args.file)
+        else:
+            mutations = extract_mutations_bionext(args.file)
 
 
     if args.out:
-        save_to_csv(mutations, args.out)
+        with tracing.span("save_to_csv", rows=len(mutations)):
+            save_to_csv(mutations, args.out)
     else:
         for m in mutations:
             print(m)
@@ -9,10 +9,14 @@ import xml.etree.ElementTree as ET
 from typing import Optional, List
 from io import BytesIO
 from pathlib import Path
+import tracing
 
 REQUEST_DELAY = 0.34  # ~3 requests/sec
 _last_request_time = 0.0
 USER_AGENT = {"User-Agent": "pmc-downloader/1.0 (+https://example.org)"}
+# service endpoints; the environment overrides are used to point the script at local stand-ins (see benchmarks/)
+EUROPEPMC_URL = os.environ.get("EUROPEPMC_URL", "https://www.ebi.ac.uk/europepmc/webservices/rest")
+PMC_OA_URL = os.environ.get("PMC_OA_URL", "https://www.ncbi.nlm.nih.gov/pmc/utils/oa/oa.fcgi")
 
 # log a debugging message
 def info(message):
@@ -39,6 +43,7 @@ def parse_args():
     parser.add_argument("--path", required=False, type=str, help="Provide the file path of the NCBI ftp if that has to be used")
     parser.add_argument("--only-xml", action="store_true", help="Extract only .nxml files")
     parser.add_argument("--ignore-errors", action="store_true", help="Continue on errors")
+    tracing.add_arguments(parser)
     return parser.parse_args()
 
 
@@ -73,7 +78,7 @@ def build_column_mapping(file_path, key_col=2, value_col=0, delimiter="\t", has_
 
 
 def europepmc_endpoint(pmcid: str) -> str:
-    return f"https://www.ebi.ac.uk/europepmc/webservices/rest/{pmcid}/supplementaryFiles"
+    return f"{EUROPEPMC_URL}/{pmcid}/supplementaryFiles"
 
 
 def _safe_path(base: str, *paths: str) -> str:
@@ -171,15 +176,17 @@ def read_pmcids(csv_path: str) -> List[str]:
         return [row.get("PMCID", "").strip() for row in reader if row.get("PMCID", "").strip()]
 
 import ftplib
-FTP_HOST = 'ftp.ncbi.nlm.nih.gov'
+FTP_HOST = os.environ.get('PMC_FTP_HOST', 'ftp.ncbi.nlm.nih.gov')
+FTP_PORT = int(os.environ.get('PMC_FTP_PORT', '21'))
 
 # following 3 functions taken from https://data.lhncbc.nlm.nih.gov/public/trec-cds-org/download.py
 def connect():
   '''Connect to the PMC OAS FTP server'''
-  info('Connecting to ftp.ncbi.nlm.nih.gov')
+  info(f'Connecting to {FTP_HOST}')
   global pmc
   try:
-    pmc = ftplib.FTP(FTP_HOST)
+    pmc = ftplib.FTP()
+    pmc.connect(FTP_HOST, FTP_PORT)
     pmc.login()
     pmc.cwd('/pub/pmc')
   except Exception as e:
@@ -189,7 +196,7 @@ def connect():
 
 def disconnect():
   '''Disconnect from the PMC OAS FTP server'''
-  info('Disconnecting from ftp.ncbi.nlm.nih.gov')
+  info(f'Disconnecting from {FTP_HOST}')
   global pmc
   pmc.close()
   #heart_attack()
@@ -207,7 +214,7 @@ def reconnect():
   connect()
 
 def get_ftp_path_from_oa(pmcid):
-    url = f"https://www.ncbi.nlm.nih.gov/pmc/utils/oa/oa.fcgi?id={pmcid}"
+    url = f"{PMC_OA_URL}?id={pmcid}"
     throttle_request()
     resp = requests.get(url, timeout=30)
     resp.raise_for_status()
@@ -280,11 +287,13 @@ def download_and_extract_ftp(pmcid, archive_path, output_dir, only_xml, ignore_e
 
 def main():
     args = parse_args()
+    tracing.setup(args)
     pmcids = read_pmcids(args.input)
     os.makedirs(args.output, exist_ok=True)
     if args.choice == 2:
         for pmcid in pmcids:
-            download_from_europepmc(pmcid, args.output, args.only_xml, args.ignore_errors)
+            with tracing.span("download_europepmc", pmcid=pmcid):
+                download_from_europepmc(pmcid, args.output, args.only_xml, args.ignore_errors)
     else:
         if (args.path):
             mapping = {}
@@ -302,11 +311,13 @@ def main():
                 else:
                     archive_path = None
             else:
-                archive_path = get_ftp_path_from_oa(pmcid)
+                with tracing.span("oa_lookup", pmcid=pmcid):
+                    archive_path = get_ftp_path_from_oa(pmcid)
             if not archive_path:
                 print(f"No archive found for {pmcid}, skipping")
                 continue
-            download_and_extract_ftp(pmcid, archive_path, args.output, args.only_xml, args.ignore_errors)
+            with tracing.span("download_ftp", pmcid=pmcid):
+                download_and_extract_ftp(pmcid, archive_path, args.output, args.only_xml, args.ignore_errors)
         disconnect()
 
 if __name__ == "__main__":
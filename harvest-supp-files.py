@@ -0,0 +1,124 @@
+import os
+import time
+import shutil
+import tarfile
+import argparse
+from functools import partial
+from typing import Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+import tracing
+
+MEMBER_FILTERS = {
+    "xls": (".xls",),
+    "xlsx": (".xlsx",),
+    "csv": (".csv",),
+    "tsv": (".tsv",),
+    "docx": (".docx",),
+    "pdf": (".pdf",),
+    "nxml": (".nxml",),
+    "images": (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".gif"),
+}
+ARCHIVE_SUFFIXES = (".tar.gz", ".tgz")
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract supplementary files from downloaded PMC .tar.gz archives into one folder per PMCID")
+    parser.add_argument("-i", "--input", required=True, help="Directory with the downloaded <PMCID>.tar.gz archives")
+    parser.add_argument("-o", "--output", default="extracted_xls", help="Directory to save the extracted files")
+    parser.add_argument("--include", nargs="+", choices=sorted(MEMBER_FILTERS), default=["xls", "xlsx"], help="Kinds of archive members to extract")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of archives processed in parallel")
+    parser.add_argument("--verbose", action="store_true", help="Print every extracted file")
+    tracing.add_arguments(parser)
+    return parser.parse_args()
+
+
+def _safe_path(base: str, *paths: str) -> str:
+    joined = os.path.normpath(os.path.join(base, *paths))
+    if not os.path.commonpath([os.path.abspath(base), os.path.abspath(joined)]) == os.path.abspath(base):
+        raise ValueError("Unsafe path detected during extraction")
+    return joined
+
+
+def archive_pmcid(filename: str) -> str:
+    for suffix in ARCHIVE_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def harvest_archive(archive_path: str, output_dir: str, extensions: Tuple[str, ...], verbose: bool = False) -> Dict:
+    """
+    stream one archive in a single pass ('r|gz': no member listing, no seeking)
+    and write the members with a matching extension to output_dir/<PMCID>/,
+    keeping their path inside the archive so same-named files do not collide.
+    """
+    pmcid = archive_pmcid(os.path.basename(archive_path))
+    pmc_dir = os.path.join(output_dir, pmcid)
+    stats = {"archive": archive_path, "bytes_in": os.path.getsize(archive_path), "members": 0, "bytes_out": 0, "error": None}
+    try:
+        with tarfile.open(archive_path, "r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or not member.name.lower().endswith(extensions):
+                    continue
+                parts = member.name.split("/")
+                # drop the archive's own top-level folder (PMCxxxx/)
+                rel_parts = parts[1:] if len(parts) > 1 else parts
+                target = _safe_path(pmc_dir, *rel_parts)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                src = tar.extractfile(member)
+                tmp_target = f"{target}.part"
+                try:
+                    with open(tmp_target, "wb") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    os.replace(tmp_target, target)
+                except BaseException:
+                    # e.g. a truncated archive: leave no partial file behind
+                    if os.path.exists(tmp_target):
+                        os.remove(tmp_target)
+                    raise
+                stats["members"] += 1
+                stats["bytes_out"] += member.size
+                if verbose:
+                    print(f"Extracted: {target} from {os.path.basename(archive_path)}")
+    except Exception as e:
+        stats["error"] = str(e)
+    return stats
+
+
+def harvest(directory: str, output_dir: str, include=("xls", "xlsx"), workers: int = 1, verbose: bool = False) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    extensions = tuple(ext for kind in include for ext in MEMBER_FILTERS[kind])
+    archives = sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(ARCHIVE_SUFFIXES)
+    )
+    task = partial(harvest_archive, output_dir=output_dir, extensions=extensions, verbose=verbose)
+
+    start = time.time()
+    n_archives = n_members = n_errors = bytes_in = bytes_out = 0
+    with tracing.span("harvest", archives=len(archives), workers=workers), ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        for stats in pool.map(task, archives, chunksize=8):
+            n_archives += 1
+            n_members += stats["members"]
+            bytes_in += stats["bytes_in"]
+            bytes_out += stats["bytes_out"]
+            if stats["error"]:
+                n_errors += 1
+                print(f"Error processing {stats['archive']}: {stats['error']}")
+            if n_archives % 1000 == 0:
+                elapsed = time.time() - start
+                print(f"{n_archives}/{len(archives)} archives, {n_archives / elapsed:.1f} archives/s, {bytes_in / elapsed / 1e6:.1f} MB/s")
+
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"Processed {n_archives} archives ({n_errors} errors) in {elapsed:.1f}s: "
+          f"{n_members} files extracted, {bytes_in / 1e6:.1f} MB read, {bytes_out / 1e6:.1f} MB written, "
+          f"{n_archives / elapsed:.1f} archives/s, {bytes_in / elapsed / 1e6:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tracing.setup(args)
+    harvest(args.input, args.output, args.include, args.workers, args.verbose)
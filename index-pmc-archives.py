@@ -0,0 +1,165 @@
+import io
+import os
+import sys
+import time
+import sqlite3
+import tarfile
+import argparse
+from typing import Optional
+
+import indexed_gzip as igzip
+
+import tracing
+
+ARCHIVE_SUFFIXES = (".tar.gz", ".tgz")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    spacing INTEGER NOT NULL,
+    gzindex BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    archive_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (archive_id, name)
+);
+"""
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Random-access index for downloaded PMC .tar.gz archives")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Index every new or changed archive in a directory")
+    build.add_argument("-d", "--directory", required=True, help="Directory with the downloaded <PMCID>.tar.gz archives")
+    build.add_argument("--db", default="pmc-archives.sqlite", help="Path of the SQLite index file")
+    build.add_argument("--spacing", type=float, default=4, help="Distance between gzip seek points in MB of uncompressed data")
+    tracing.add_arguments(build)
+
+    extract = sub.add_parser("extract", help="Extract one member of an indexed archive")
+    extract.add_argument("-a", "--archive", required=True, help="Path of the .tar.gz archive")
+    extract.add_argument("-m", "--member", required=True, help="Member name, or the end of it (e.g. 'table1.xlsx' or the .nxml name)")
+    extract.add_argument("--db", default="pmc-archives.sqlite", help="Path of the SQLite index file")
+    extract.add_argument("-o", "--output", help="File to write the member to (default: stdout)")
+    tracing.add_arguments(extract)
+    return parser.parse_args()
+
+
+def open_db(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def index_archive(conn: sqlite3.Connection, archive_path: str, spacing: int) -> int:
+    """
+    read the archive once, recording where every member's data starts in the
+    uncompressed stream, together with a zran-style gzip index (a seek point
+    with its 32 KiB inflate window every `spacing` bytes).
+    """
+    stat = os.stat(archive_path)
+    members = []
+    with igzip.IndexedGzipFile(archive_path, spacing=spacing) as gz:
+        with tarfile.open(fileobj=gz, mode="r:") as tar:
+            for member in tar:
+                if member.isfile():
+                    members.append((member.name, member.offset_data, member.size))
+        gz.build_full_index()
+        buf = io.BytesIO()
+        gz.export_index(fileobj=buf)
+
+    with conn:
+        conn.execute("DELETE FROM members WHERE archive_id IN (SELECT id FROM archives WHERE path = ?)", (archive_path,))
+        conn.execute("DELETE FROM archives WHERE path = ?", (archive_path,))
+        cur = conn.execute(
+            "INSERT INTO archives (path, mtime, size, spacing, gzindex) VALUES (?, ?, ?, ?, ?)",
+            (archive_path, stat.st_mtime, stat.st_size, spacing, buf.getvalue()),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO members (archive_id, name, offset, size) VALUES (?, ?, ?, ?)",
+            [(cur.lastrowid, name, offset, size) for name, offset, size in members],
+        )
+    return len(members)
+
+
+def build_index(directory: str, db_path: str, spacing: int) -> None:
+    conn = open_db(db_path)
+    known = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime, size FROM archives")}
+    start = time.time()
+    n_indexed = n_skipped = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(ARCHIVE_SUFFIXES):
+            continue
+        archive_path = os.path.abspath(os.path.join(directory, filename))
+        stat = os.stat(archive_path)
+        if known.get(archive_path) == (stat.st_mtime, stat.st_size):
+            n_skipped += 1
+            continue
+        try:
+            with tracing.span("index_archive", archive=filename):
+                n_members = index_archive(conn, archive_path, spacing)
+            n_indexed += 1
+            print(f"Indexed {filename} ({n_members} members)")
+        except Exception as e:
+            print(f"Error indexing {filename}: {e}")
+    conn.close()
+    print(f"Indexed {n_indexed}, unchanged {n_skipped} archives in {time.time() - start:.1f}s")
+
+
+def read_member(db_path: str, archive_path: str, member_name: str) -> Optional[bytes]:
+    """
+    return the content of one archive member, or None if the archive or member
+    is not indexed. only the data between the nearest seek point and the member
+    is decompressed, whatever the member's position in the archive.
+    """
+    archive_path = os.path.abspath(archive_path)
+    conn = open_db(db_path)
+    try:
+        row = conn.execute("SELECT id, mtime, size, gzindex FROM archives WHERE path = ?", (archive_path,)).fetchone()
+        if row is None:
+            return None
+        archive_id, mtime, size, gzindex = row
+        stat = os.stat(archive_path)
+        if (stat.st_mtime, stat.st_size) != (mtime, size):
+            raise ValueError(f"{archive_path} changed since it was indexed, rebuild the index")
+        member = conn.execute(
+            "SELECT offset, size FROM members WHERE archive_id = ? AND name = ?", (archive_id, member_name)
+        ).fetchone() or conn.execute(
+            "SELECT offset, size FROM members WHERE archive_id = ? AND name LIKE ? ESCAPE '\\' ORDER BY name LIMIT 1",
+            (archive_id, "%/" + member_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")),
+        ).fetchone()
+    finally:
+        conn.close()
+    if member is None:
+        return None
+
+    offset, length = member
+    with igzip.IndexedGzipFile(archive_path) as gz:
+        gz.import_index(fileobj=io.BytesIO(gzindex))
+        gz.seek(offset)
+        return gz.read(length)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tracing.setup(args)
+    if args.command == "build":
+        build_index(args.directory, args.db, int(args.spacing * 1024 * 1024))
+    else:
+        with tracing.span("read_member", archive=args.archive, member=args.member):
+            data = read_member(args.db, args.archive, args.member)
+        if data is None:
+            print(f"{args.member} not found in the index of {args.archive}", file=sys.stderr)
+            sys.exit(1)
+        if args.output:
+            with open(args.output, "wb") as f:
+                f.write(data)
+        else:
+            sys.stdout.buffer.write(data)
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+import pyexcel
+
+import tracing
+from sheet_cache import decode_value, encode_value
+
+TABLE_EXTENSIONS = (".xls", ".xlsx", ".tsv")
+TOKEN_RE = re.compile(r"[0-9a-z]+")
+MAX_TERM = 32  # indexed suffixes and query terms are truncated to this length
+RECORD_FORMAT = 1  # stored as PRAGMA user_version; bump when the way records are stored changes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rows_file ON rows (file_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    PRIMARY KEY (term, row_id, col)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_row ON postings (row_id);
+"""
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build and query an inverted index over supplementary xls/xlsx/tsv tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Index (or incrementally re-index) all tables below a directory")
+    build.add_argument("-d", "--directory", required=True, help="Root of the extracted supplementary files")
+    build.add_argument("--index", default="supp-index.sqlite", help="Path of the SQLite index file")
+    tracing.add_arguments(build)
+
+    query = sub.add_parser("query", help="Return the rows matching one or more phrases")
+    query.add_argument("-s", "--search", required=True, nargs="+", help="Phrase(s) to search for; a row matches if it contains any of them")
+    query.add_argument("--index", default="supp-index.sqlite", help="Path of the SQLite index file")
+    tracing.add_arguments(query)
+    return parser.parse_args()
+
+
+def tokenize(value) -> List[str]:
+    # normalized cell tokens: lower-cased alphanumeric runs, so 'gyrA-S83L' -> ['gyra', 's83l']
+    return TOKEN_RE.findall(str(value).lower())
+
+
+def index_terms(value) -> set:
+    # every suffix of every token, so that a prefix lookup finds substrings ('83' in 's83l')
+    return {token[i:i + MAX_TERM] for token in tokenize(value) for i in range(len(token))}
+
+
+def open_index(index_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version != RECORD_FORMAT:
+        # records written in another format can not be read back: start over, build re-indexes every file
+        with conn:
+            if conn.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+                print(f"{index_path} was written in an older format and has been cleared, run build again")
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM rows")
+            conn.execute("DELETE FROM files")
+        conn.execute(f"PRAGMA user_version = {RECORD_FORMAT}")
+    return conn
+
+
+def dump_record(record: Dict) -> str:
+    # keys and values with their type tags, so dates, times, ints and floats come back as such
+    return json.dumps([[encode_value(key), encode_value(value)] for key, value in record.items()])
+
+
+def load_record(record_json: str) -> OrderedDict:
+    return OrderedDict((decode_value(*key), decode_value(*value)) for key, value in json.loads(record_json))
+
+
+def read_table_records(path: str) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    yield (sheet_name, records) for every sheet of a table file. records have the
+    same shape as the ones searched by extract-info-xls-gem.py: one dict per row,
+    keyed by the header row.
+    """
+    if path.lower().endswith(".tsv"):
+        df = pd.read_csv(path, sep="\t")
+        yield "mutations", df.to_dict(orient="records")
+        return
+
+    book = pyexcel.get_book(file_name=path)
+    try:
+        for sheet in book:
+            if sheet.number_of_rows() == 0:
+                continue
+            sheet.name_columns_by_row(0)
+            yield sheet.name, sheet.to_records()
+    finally:
+        pyexcel.free_resources()
+
+
+def iter_table_files(directory: str) -> Iterator[str]:
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.lower().endswith(TABLE_EXTENSIONS):
+                yield os.path.abspath(os.path.join(dirpath, filename))
+
+
+def _delete_file(conn: sqlite3.Connection, file_id: int) -> None:
+    conn.execute("DELETE FROM postings WHERE row_id IN (SELECT id FROM rows WHERE file_id = ?)", (file_id,))
+    conn.execute("DELETE FROM rows WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def index_file(conn: sqlite3.Connection, path: str, mtime: float, size: int) -> int:
+    cur = conn.execute("INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)", (path, mtime, size))
+    file_id = cur.lastrowid
+    n_rows = 0
+    for sheet_name, records in read_table_records(path):
+        for row_number, record in enumerate(records):
+            cur = conn.execute(
+                "INSERT INTO rows (file_id, sheet, row, record) VALUES (?, ?, ?, ?)",
+                (file_id, str(sheet_name), row_number, dump_record(record)),
+            )
+            row_id = cur.lastrowid
+            postings = {
+                (term, row_id, col)
+                for col, value in enumerate(record.values())
+                for term in index_terms(value)
+            }
+            conn.executemany("INSERT OR IGNORE INTO postings (term, row_id, col) VALUES (?, ?, ?)", postings)
+            n_rows += 1
+    return n_rows
+
+
+def build_index(directory: str, index_path: str) -> None:
+    """
+    walk the download tree once and (re-)index every table file whose size or
+    mtime changed since the last run; files that disappeared are dropped.
+    """
+    conn = open_index(index_path)
+    root = os.path.abspath(directory)
+    known = {path: (file_id, mtime, size) for file_id, path, mtime, size in conn.execute("SELECT id, path, mtime, size FROM files")}
+    seen = set()
+    start = time.time()
+    n_indexed = n_skipped = n_failed = 0
+
+    for path in iter_table_files(directory):
+        seen.add(path)
+        stat = os.stat(path)
+        previous = known.get(path)
+        if previous and previous[1] == stat.st_mtime and previous[2] == stat.st_size:
+            n_skipped += 1
+            continue
+        try:
+            with conn, tracing.span("index_file", file=path):
+                if previous:
+                    _delete_file(conn, previous[0])
+                n_rows = index_file(conn, path, stat.st_mtime, stat.st_size)
+            n_indexed += 1
+            print(f"Indexed {path} ({n_rows} rows)")
+        except Exception as e:
+            n_failed += 1
+            print(f"Error indexing {path}: {e}")
+
+    with conn:
+        for path, (file_id, _, _) in known.items():
+            if path not in seen and os.path.commonpath([root, path]) == root:
+                _delete_file(conn, file_id)
+                print(f"Removed {path} from index")
+    conn.close()
+    print(f"Indexed {n_indexed}, unchanged {n_skipped}, failed {n_failed} files in {time.time() - start:.1f}s")
+
+
+def _candidate_rows(conn: sqlite3.Connection, phrase: str):
+    # rows where every token of the phrase occurs inside some cell token
+    terms = [term[:MAX_TERM] for term in tokenize(phrase)]
+    if not terms:
+        return conn.execute("SELECT id FROM rows")
+    clauses = " INTERSECT ".join("SELECT row_id FROM postings WHERE term >= ? AND term < ?" for _ in terms)
+    params = [bound for term in terms for bound in (term, term + "\uffff")]
+    return conn.execute(clauses, params)
+
+
+def query_index(index_path: str, search_phrase) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    return {file: {sheet: [records]}} for rows containing any of the phrases.
+    the index narrows the candidates to a superset of the matches; each candidate is
+    then checked with the same case-insensitive substring test extract-info-xls-gem.py uses.
+    """
+    phrases = [search_phrase.lower()] if isinstance(search_phrase, str) else [p.lower() for p in search_phrase]
+    conn = open_index(index_path)
+    row_ids = set()
+    for phrase in phrases:
+        row_ids.update(row_id for (row_id,) in _candidate_rows(conn, phrase))
+
+    results: Dict[str, Dict[str, List[Dict]]] = {}
+    ids = sorted(row_ids)
+    for i in range(0, len(ids), 500):
+        batch = ids[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT files.path, rows.sheet, rows.record FROM rows JOIN files ON files.id = rows.file_id "
+            f"WHERE rows.id IN ({placeholders}) ORDER BY files.path, rows.id",
+            batch,
+        )
+        for path, sheet, record_json in rows:
+            record = load_record(record_json)
+            if any(phrase in str(v).lower() for phrase in phrases for v in record.values()):
+                results.setdefault(path, {}).setdefault(sheet, []).append(record)
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tracing.setup(args)
+    if args.command == "build":
+        build_index(args.directory, args.index)
+    else:
+        with tracing.span("query_index", search=args.search):
+            matches = query_index(args.index, args.search)
+        if not matches:
+            print(f"No matches found for '{args.search}'.")
+        else:
+            print(matches)
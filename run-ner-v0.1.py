@@ -9,10 +9,13 @@ import logging
 from pathlib import Path
 from typing import Optional, List
 from datetime import datetime
+import tracing
 
 REQUEST_DELAY = 0.34  # ~3 requests/sec
 _last_request_time = 0.0
 USER_AGENT = {"User-Agent": "pmc-downloader/1.0 (+https://example.org)"}
+# overridable to point the script at a local stand-in (see benchmarks/)
+PUBTATOR_URL = os.environ.get("PUBTATOR_URL", "https://www.ncbi.nlm.nih.gov/research/pubtator3-api")
 
 
 # for logging
@@ -42,6 +45,7 @@ def parse_args():
     parser.add_argument("--bionext-path", default=".", help="Path to the bionext main")
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     parser.add_argument("--log-file", default=f"run_{timestamp}.log", help="Logfile for recording logs of all functions")
+    tracing.add_arguments(parser)
 
     return parser.parse_args()
 
@@ -60,7 +64,7 @@ def read_pmcids(csv_path: str) -> List[str]:
 
 
 def tmVar3_endpoint(pmid: str) -> str:
-    return f"https://www.ncbi.nlm.nih.gov/research/pubtator3-api/publications/export/biocxml?pmids={pmid}&full=true"
+    return f"{PUBTATOR_URL}/publications/export/biocxml?pmids={pmid}&full=true"
 
 
 ## delay in requests
@@ -73,7 +77,7 @@ def throttle_request() -> None:
     _last_request_time = time.time()
 
 
-def download_from_tmVar3(pmcid: str, output_dir: str, ignore_errors: bool, looger: logging.Logger) -> None:
+def download_from_tmVar3(pmcid: str, output_dir: str, ignore_errors: bool, logger: logging.Logger) -> None:
     pmc_folder = os.path.join(output_dir, f"{pmcid}.xml")
     if os.path.exists(pmc_folder):
         logger.info(f"{pmcid}: already exists")
@@ -110,7 +114,8 @@ def run_bionext(pmcid: str, output_dir: str, ignore_errors: bool, pipenv_dir: st
     #print(cmd)
     try:
         #result = subprocess.run(cmd, cwd=pipenv_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, capture_output=True, text=True, timeout=10000)
-        result = subprocess.run(cmd, cwd=pipenv_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=10000)
+        with tracing.span("bionext_subprocess", pmid=pmcid):
+            result = subprocess.run(cmd, cwd=pipenv_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=10000)
         logger.info(result.stdout)
         result.check_returncode()
         with open(pmc_file, "w", encoding="utf-8") as f:
@@ -124,6 +129,7 @@ def run_bionext(pmcid: str, output_dir: str, ignore_errors: bool, pipenv_dir: st
 
 if __name__ == "__main__":
     args = parse_args()
+    tracing.setup(args)
     pmcids = read_pmcids(args.input)
     #print(pmcids)
     os.makedirs(args.output, exist_ok=True)
@@ -134,11 +140,12 @@ if __name__ == "__main__":
     for pmc in pmcids:
         logger.info(f"Processing {pmc} with {args.tool}")
         #print(pmc)
-        if args.tool == "tmVar3":
-            #throttle_request()
-            download_from_tmVar3(pmc, args.output, args.ignore_errors, logger)
-        else:
-            run_bionext(pmc, args.output, args.ignore_errors, args.pipenv_dir, args.bionext_path, logger)
+        with tracing.span(args.tool, pmid=pmc):
+            if args.tool == "tmVar3":
+                #throttle_request()
+                download_from_tmVar3(pmc, args.output, args.ignore_errors, logger)
+            else:
+                run_bionext(pmc, args.output, args.ignore_errors, args.pipenv_dir, args.bionext_path, logger)
 
 
 
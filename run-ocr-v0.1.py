@@ -0,0 +1,179 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import logging
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tracing
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+PDF_EXTENSIONS = (".pdf",)
+OCR_VERSION = "paddleocr-3.2.0"  # part of the cache key; bump when the model or its settings change
+
+_ocr = None  # one PaddleOCR instance per worker process
+
+
+# for logging
+def setup_logger(log_path: str):
+    logger = logging.getLogger("table_ocr")
+    logger.setLevel(logging.INFO)
+    # Clear previous handlers
+    if logger.hasHandlers():
+        logger.handlers.clear()
+    handler = logging.FileHandler(log_path, mode="w", encoding="utf-8")
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    return logger
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run PaddleOCR (CPU) over the table images in extracted PMC archives")
+    parser.add_argument("-i", "--input", required=True, help="Directory with the extracted PMC archives (one sub-directory per PMCID)")
+    parser.add_argument("-o", "--output", required=True, help="Directory to save the OCR JSON files")
+    parser.add_argument("--cache-dir", default=None, help="Directory of the content-hash cache (default: <output>/.ocr-cache)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Number of OCR worker processes")
+    parser.add_argument("--lang", default="en", help="PaddleOCR language model")
+    parser.add_argument("--dpi", type=int, default=200, help="Resolution used to render pdf pages")
+    parser.add_argument("--no-pdf", action="store_true", help="Skip pdf files")
+    parser.add_argument("--ignore-errors", action="store_true", help="Continue on errors")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    parser.add_argument("--log-file", default=f"ocr_{timestamp}.log", help="Logfile for recording logs of all functions")
+    tracing.add_arguments(parser)
+    return parser.parse_args()
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def find_table_images(input_dir: str, include_pdf: bool = True) -> List[Tuple[str, str]]:
+    # (pmcid, path) for every image (and pdf) below input_dir/<PMCID>/
+    extensions = IMAGE_EXTENSIONS + (PDF_EXTENSIONS if include_pdf else ())
+    found = []
+    for dirpath, _, filenames in os.walk(input_dir):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(extensions):
+                path = os.path.join(dirpath, filename)
+                pmcid = os.path.relpath(path, input_dir).split(os.sep)[0]
+                found.append((pmcid, path))
+    return found
+
+
+def pdf_page_count(path: str) -> int:
+    import fitz  # pymupdf
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _init_worker(lang: str) -> None:
+    # load the model once per worker, not once per image
+    global _ocr
+    from paddleocr import PaddleOCR
+    _ocr = PaddleOCR(
+        lang=lang,
+        device="cpu",
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False,
+    )
+
+
+def _render_pdf_page(path: str, page: int, dpi: int):
+    import fitz  # pymupdf
+    import numpy as np
+    with fitz.open(path) as doc:
+        pix = doc[page].get_pixmap(dpi=dpi, alpha=False)
+        rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return np.ascontiguousarray(rgb[:, :, ::-1])  # PaddleOCR expects BGR arrays
+
+
+def ocr_image(path: str, page: Optional[int], dpi: int) -> Dict:
+    # run in a worker: returns {'res': {..., 'rec_texts': [...], 'rec_polys': [...]}}
+    image = path if page is None else _render_pdf_page(path, page, dpi)
+    result = _ocr.predict(input=image)
+    if not result:
+        return {"res": {"rec_texts": [], "rec_polys": []}}
+    data = result[0].json
+    return data if "res" in data else {"res": data}
+
+
+def output_path(output_dir: str, input_dir: str, path: str, page: Optional[int]) -> str:
+    # the image extension is kept (fig1.tif.json, doc.pdf.p1.json) so fig1.jpg and fig1.tif do not collide
+    rel = os.path.relpath(path, input_dir)
+    suffix = "" if page is None else f".p{page + 1}"
+    return os.path.join(output_dir, f"{rel}{suffix}.json")
+
+
+def run_ocr(input_dir: str, output_dir: str, cache_dir: str, workers: int, lang: str, dpi: int,
+            include_pdf: bool, ignore_errors: bool, logger: logging.Logger) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    pending = []
+    n_cached = 0
+    for pmcid, path in find_table_images(input_dir, include_pdf):
+        try:
+            with tracing.span("file_digest", file=path):
+                digest = file_digest(path)
+            pages = [None] if not path.lower().endswith(PDF_EXTENSIONS) else list(range(pdf_page_count(path)))
+        except Exception as e:
+            logger.error(f"{pmcid}: {path}: error - {e}")
+            if not ignore_errors:
+                raise
+            continue
+        for page in pages:
+            key = hashlib.sha256(f"{digest}:{page}:{OCR_VERSION}:{lang}:{dpi}".encode()).hexdigest()
+            cached = os.path.join(cache_dir, f"{key}.json")
+            out_path = output_path(output_dir, input_dir, path, page)
+            if os.path.exists(cached):
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                shutil.copyfile(cached, out_path)
+                n_cached += 1
+                logger.info(f"{pmcid}: {out_path} (cached)")
+            else:
+                pending.append((pmcid, path, page, cached, out_path))
+
+    logger.info(f"{n_cached} images from cache, {len(pending)} to OCR with {workers} workers")
+    print(f"{n_cached} images from cache, {len(pending)} to OCR with {workers} workers")
+    if not pending:
+        return
+
+    with tracing.span("ocr_pool", images=len(pending), workers=workers), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lang,)) as pool:
+        futures = {pool.submit(ocr_image, path, page, dpi): (pmcid, path, page, cached, out_path)
+                   for pmcid, path, page, cached, out_path in pending}
+        for future in as_completed(futures):
+            pmcid, path, page, cached, out_path = futures[future]
+            try:
+                data = future.result()
+                tmp_path = f"{cached}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, cached)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                shutil.copyfile(cached, out_path)
+                logger.info(f"{pmcid}: {out_path}")
+            except Exception as e:
+                logger.error(f"{pmcid}: {path} (page {page}): error - {e}")
+                if not ignore_errors:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tracing.setup(args)
+    os.makedirs(args.output, exist_ok=True)
+    log_path = os.path.join(args.output, args.log_file)
+    logger = setup_logger(log_path)
+    cache_dir = args.cache_dir or os.path.join(args.output, ".ocr-cache")
+    run_ocr(args.input, args.output, cache_dir, args.workers, args.lang, args.dpi,
+            not args.no_pdf, args.ignore_errors, logger)
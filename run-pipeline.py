@@ -0,0 +1,332 @@
+import os
+import csv
+import json
+import hashlib
+import argparse
+import logging
+import tarfile
+import threading
+import importlib.util
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tracing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TMVAR3_FIELDS = ["type", "pmc-id", "identifier", "text", "offset", "length"]
+BIONEXT_FIELDS = ["type", "pmid", "identifier", "text", "offset", "length"]
+
+_modules = {}
+_modules_lock = threading.Lock()  # load_script is called from the stage worker threads
+
+
+# for logging
+def setup_logger(log_path: str):
+    logger = logging.getLogger("pipeline")
+    logger.setLevel(logging.INFO)
+    # Clear previous handlers
+    if logger.hasHandlers():
+        logger.handlers.clear()
+    handler = logging.FileHandler(log_path, mode="w", encoding="utf-8")
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(threadName)s - %(message)s")
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+    return logger
+
+
+## argument parser
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run download, NER, mutation extraction and comparison for a list of articles")
+    parser.add_argument("-i", "--input", required=True, help="Path to CSV file with PMID and/or PMCID columns")
+    parser.add_argument("-o", "--output", required=True, help="Directory for all stage outputs")
+    parser.add_argument("--tools", nargs="+", choices=["tmVar3", "bionext"], default=["tmVar3"], help="NER tools to run; with both, their mutations are compared")
+    parser.add_argument("--download", type=int, choices=[0, 1, 2], default=0, help="Download the articles from PMC (1), EuropePMC (2), or not at all (0)")
+    parser.add_argument("--oa-file-list", help="NCBI oa_file_list.txt to map PMCIDs to ftp paths instead of the OA web service")
+    parser.add_argument("--only-xml", action="store_true", help="EuropePMC download: extract only .nxml files")
+    parser.add_argument("--pipenv-dir", default=".", help="Path to the Pipenv project for bionext")
+    parser.add_argument("--bionext-path", default=".", help="Path to the bionext main")
+    parser.add_argument("--threshold", type=int, default=85, help="Fuzzy match threshold for the comparison")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Threads for the local (non-network) stages")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    parser.add_argument("--log-file", default=f"pipeline_{timestamp}.log", help="Logfile for recording logs of all stages")
+    tracing.add_arguments(parser)
+    return parser.parse_args()
+
+
+def load_script(filename: str):
+    # the pipeline scripts have dashes in their names, so they are loaded by path
+    with _modules_lock:
+        if filename not in _modules:
+            spec = importlib.util.spec_from_file_location(filename.replace("-", "_").replace(".", "_")[:-3], os.path.join(SCRIPT_DIR, filename))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _modules[filename] = module
+        return _modules[filename]
+
+
+def read_items(csv_path: str) -> List[Dict[str, str]]:
+    # one item per row; utf-8-sig for the BOM, see read_pmcids in run-ner-v0.1.py
+    items = []
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            pmid = (row.get("PMID") or "").strip()
+            pmcid = (row.get("PMCID") or "").strip()
+            if pmid or pmcid:
+                items.append({"id": pmid or pmcid, "pmid": pmid, "pmcid": pmcid})
+    return items
+
+
+def path_digest(path: str) -> str:
+    # content hash of a file, or of all files below a directory
+    h = hashlib.sha256()
+    if os.path.isdir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                file_path = os.path.join(dirpath, filename)
+                h.update(os.path.relpath(file_path, path).encode())
+                h.update(path_digest(file_path).encode())
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    one step of the pipeline for a single item. run(item, inputs) gets the
+    outputs of the dependencies as {stage name: [paths]} and returns the paths
+    it produced. bump version whenever the stage's outputs would change.
+    """
+    def __init__(self, name: str, version: str, run: Callable, deps=(), workers: int = 1,
+                 applies: Callable = lambda item: True, params: str = ""):
+        self.name = name
+        self.version = version
+        self.run = run
+        self.deps = tuple(deps)
+        self.workers = workers
+        self.applies = applies
+        self.params = params
+
+
+class StageCache:
+    # per-item manifests: <cache_dir>/<stage>/<item id>.json = {"key": ..., "outputs": {path: sha256}}
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _manifest_path(self, stage: Stage, item_id: str) -> str:
+        return os.path.join(self.cache_dir, stage.name, f"{item_id}.json")
+
+    def key(self, stage: Stage, item: Dict, input_hashes: Dict[str, str]) -> str:
+        material = json.dumps([stage.name, stage.version, stage.params, item, sorted(input_hashes.items())])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, stage: Stage, item_id: str, key: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._manifest_path(stage, item_id), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("key") != key:
+            return None
+        # the outputs must still be what was recorded: downstream keys are built from these digests
+        for path, digest in manifest["outputs"].items():
+            if not os.path.exists(path) or path_digest(path) != digest:
+                return None
+        return manifest["outputs"]
+
+    def put(self, stage: Stage, item_id: str, key: str, outputs: Dict[str, str]) -> None:
+        manifest_path = self._manifest_path(stage, item_id)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "outputs": outputs}, f)
+        os.replace(tmp_path, manifest_path)
+
+
+class Pipeline:
+    """
+    runs the stages as a DAG over all items. every stage has its own thread
+    pool, and an (item, stage) pair is submitted as soon as all its
+    dependencies are done for that item, so items flow through the stages
+    independently. results are reused when the stage version, parameters and
+    the content hashes of the inputs match the cached manifest.
+    """
+    def __init__(self, stages: List[Stage], cache: StageCache, logger: logging.Logger):
+        self.stages = {stage.name: stage for stage in stages}
+        self.dependents = {stage.name: [s for s in stages if stage.name in s.deps] for stage in stages}
+        self.cache = cache
+        self.logger = logger
+
+    def _execute(self, stage: Stage, item: Dict, inputs: Dict[str, Dict[str, str]]):
+        input_hashes = {path: digest for outputs in inputs.values() for path, digest in outputs.items()}
+        key = self.cache.key(stage, item, input_hashes)
+        cached = self.cache.get(stage, item["id"], key)
+        if cached is not None:
+            self.logger.info(f"{item['id']}: {stage.name} (cached)")
+            return cached, True
+        self.logger.info(f"{item['id']}: {stage.name}")
+        with tracing.span(stage.name, id=item["id"]):
+            paths = stage.run(item, {name: list(outputs) for name, outputs in inputs.items()})
+            outputs = {path: path_digest(path) for path in paths}
+        self.cache.put(stage, item["id"], key, outputs)
+        return outputs, False
+
+    def run(self, items: List[Dict]) -> Dict[str, int]:
+        pools = {name: ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=name) for name, stage in self.stages.items()}
+        results = {}  # (stage name, item id) -> outputs, or None when failed/skipped
+        submitted = set()
+        futures = {}
+        counts = {"done": 0, "cached": 0, "failed": 0, "skipped": 0}
+
+        def submit_ready(item, stage_names):
+            for name in stage_names:
+                stage = self.stages[name]
+                if (name, item["id"]) in submitted or any((dep, item["id"]) not in results for dep in stage.deps):
+                    continue
+                submitted.add((name, item["id"]))
+                inputs = {dep: results[(dep, item["id"])] for dep in stage.deps}
+                if not stage.applies(item) or any(outputs is None for outputs in inputs.values()):
+                    results[(name, item["id"])] = None
+                    counts["skipped"] += 1
+                    submit_ready(item, [s.name for s in self.dependents[name]])
+                    continue
+                futures[pools[name].submit(self._execute, stage, item, inputs)] = (stage, item)
+
+        try:
+            roots = [name for name, stage in self.stages.items() if not stage.deps]
+            for item in items:
+                submit_ready(item, roots)
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, item = futures.pop(future)
+                    try:
+                        results[(stage.name, item["id"])], was_cached = future.result()
+                        counts["cached" if was_cached else "done"] += 1
+                    except Exception as e:
+                        self.logger.error(f"{item['id']}: {stage.name} - error - {e}")
+                        print(f"{item['id']}: {stage.name} failed - {e}")
+                        results[(stage.name, item["id"])] = None
+                        counts["failed"] += 1
+                    submit_ready(item, [s.name for s in self.dependents[stage.name]])
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+        return counts
+
+
+def _save_mutations(mutations: List[Dict], out_path: str, fieldnames: List[str]) -> None:
+    # save_to_csv writes nothing for an article without mutations; keep an empty table instead
+    if mutations:
+        load_script("extract-mutations.py").save_to_csv(mutations, out_path)
+    else:
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            csv.DictWriter(f, fieldnames=fieldnames).writeheader()
+
+
+def build_stages(args, logger: logging.Logger) -> List[Stage]:
+    out = args.output
+    dirs = {name: os.path.join(out, name) for name in ("download", "tmVar3", "bionext", "mutations", "compare")}
+    for path in dirs.values():
+        os.makedirs(path, exist_ok=True)
+    stages = []
+
+    if args.download:
+        getdata = load_script("get-data-v0.1.py")
+        mapping = getdata.build_column_mapping(args.oa_file_list, key_col=2, value_col=0) if args.oa_file_list else None
+        ftp_connected = []
+
+        def download(item, inputs):
+            if args.download == 2:
+                getdata.download_from_europepmc(item["pmcid"], dirs["download"], args.only_xml, False)
+                return [os.path.join(dirs["download"], item["pmcid"])]
+            if not ftp_connected:
+                getdata.connect()  # one connection, reused by the single download worker
+                ftp_connected.append(True)
+            archive_path = mapping.get(item["pmcid"]) if mapping is not None else getdata.get_ftp_path_from_oa(item["pmcid"])
+            if not archive_path:
+                raise ValueError(f"No archive found for {item['pmcid']}")
+            target = os.path.join(dirs["download"], f"{item['pmcid']}.tar.gz")
+            existed = os.path.exists(target)
+            # returns True after a download, None when it skipped an existing file or gave up after 5 attempts
+            downloaded = getdata.download_and_extract_ftp(item["pmcid"], archive_path, dirs["download"], args.only_xml, False)
+            if downloaded is not True and not existed:
+                if os.path.exists(target):
+                    os.remove(target)  # partial file of the failed attempts
+                raise RuntimeError(f"Download of {archive_path} failed")
+            if not tarfile.is_tarfile(target):
+                os.remove(target)  # so that the next run fetches it again
+                raise RuntimeError(f"{target} is not a readable archive")
+            return [target]
+
+        stages.append(Stage("download", "1", download, applies=lambda item: bool(item["pmcid"]),
+                            params=f"{args.download}:{args.only_xml}"))
+
+    if "tmVar3" in args.tools:
+        runner = load_script("run-ner-v0.1.py")
+
+        def ner_tmvar3(item, inputs):
+            runner.download_from_tmVar3(item["pmid"], dirs["tmVar3"], False, logger)
+            return [os.path.join(dirs["tmVar3"], f"{item['pmid']}.xml")]
+
+        def extract_tmvar3(item, inputs):
+            extractor = load_script("extract-mutations.py")
+            out_path = os.path.join(dirs["mutations"], f"{item['pmid']}.xml.csv")
+            _save_mutations(extractor.extract_mutations_tmVar3(inputs["ner_tmVar3"][0]), out_path, TMVAR3_FIELDS)
+            return [out_path]
+
+        stages.append(Stage("ner_tmVar3", "1", ner_tmvar3, applies=lambda item: bool(item["pmid"])))
+        stages.append(Stage("extract_tmVar3", "1", extract_tmvar3, deps=["ner_tmVar3"], workers=args.workers))
+
+    if "bionext" in args.tools:
+        runner = load_script("run-ner-v0.1.py")
+
+        def ner_bionext(item, inputs):
+            runner.run_bionext(item["pmid"], dirs["bionext"], False, args.pipenv_dir, args.bionext_path, logger)
+            return [os.path.join(dirs["bionext"], "tagger", f"pubmed_{item['pmid']}.json")]
+
+        def extract_bionext(item, inputs):
+            extractor = load_script("extract-mutations.py")
+            out_path = os.path.join(dirs["mutations"], f"{item['pmid']}.bionext.csv")
+            _save_mutations(extractor.extract_mutations_bionext(inputs["ner_bionext"][0]), out_path, BIONEXT_FIELDS)
+            return [out_path]
+
+        stages.append(Stage("ner_bionext", "1", ner_bionext, applies=lambda item: bool(item["pmid"]),
+                            params=args.bionext_path))
+        stages.append(Stage("extract_bionext", "1", extract_bionext, deps=["ner_bionext"], workers=args.workers))
+
+    if "tmVar3" in args.tools and "bionext" in args.tools:
+        def compare(item, inputs):
+            comparer = load_script("compare-mutations.py")
+            pd = comparer.pd
+            tmvar_df = comparer.load_tmvar_csv(inputs["extract_tmVar3"][0])
+            bionext_df = comparer.load_bionext_csv(inputs["extract_bionext"][0])
+            tp, fp, fn = comparer.compare_mutations(tmvar_df, bionext_df, args.threshold)
+            prefix = os.path.join(dirs["compare"], item["pmid"])
+            pd.DataFrame(tp, columns=["pmid", "tmvar_text", "tmvar_normalized", "tmvar_offset",
+                                      "bionext_text", "bionext_normalized", "bionext_offset", "similarity"]).to_csv(f"{prefix}_TP.csv", index=False)
+            pd.DataFrame(fp, columns=["pmid", "bionext_text", "bionext_normalized", "bionext_offset"]).to_csv(f"{prefix}_FP.csv", index=False)
+            pd.DataFrame(fn, columns=["pmid", "tmvar_text", "tmvar_normalized", "tmvar_offset"]).to_csv(f"{prefix}_FN.csv", index=False)
+            return [f"{prefix}_TP.csv", f"{prefix}_FP.csv", f"{prefix}_FN.csv"]
+
+        stages.append(Stage("compare", "1", compare, deps=["extract_tmVar3", "extract_bionext"], workers=args.workers,
+                            params=str(args.threshold)))
+    return stages
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tracing.setup(args)
+    os.makedirs(args.output, exist_ok=True)
+    logger = setup_logger(os.path.join(args.output, args.log_file))
+    items = read_items(args.input)
+    stages = build_stages(args, logger)
+    pipeline = Pipeline(stages, StageCache(os.path.join(args.output, ".pipeline-cache")), logger)
+    counts = pipeline.run(items)
+    if args.download == 1 and "get-data-v0.1.py" in _modules and hasattr(_modules["get-data-v0.1.py"], "pmc"):
+        _modules["get-data-v0.1.py"].disconnect()
+    print(f"{len(items)} items: {counts['done']} stage runs done, {counts['cached']} cached, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped")
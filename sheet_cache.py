@@ -0,0 +1,268 @@
+# file: sheet_cache.py
+# on-disk cache of parsed sheets, keyed by the content hash of the input file
+# and the version of the parser that produced them. every sheet is stored as
+# a Feather (Arrow IPC) file, the cache directory is kept under a size limit
+# by evicting the least recently used entries. pandas and pyarrow are only
+# imported by the functions that need them, importing this module is cheap.
+import os
+import sys
+import json
+import errno
+import shutil
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import tracing
+
+if TYPE_CHECKING:  # for the annotations only, see the lazy imports below
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "curateMVIKG", "sheets")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# a sheet is (sheet_name, column_names, columns), every column a list of python values
+Sheet = Tuple[str, List, List[List]]
+
+_ARROW_TYPES = {str: "string", int: "int64", float: "float64", bool: "bool_"}  # pyarrow type factories
+
+# columns that mix python types are stored as text plus a per-cell type tag
+_ENCODERS = {
+    str: ("s", str),
+    int: ("i", str),
+    float: ("f", repr),
+    bool: ("b", str),
+    type(None): ("n", lambda v: ""),
+    datetime.datetime: ("t", lambda v: v.isoformat()),
+    datetime.date: ("d", lambda v: v.isoformat()),
+    datetime.time: ("m", lambda v: v.isoformat()),
+}
+_DECODERS = {
+    "s": str,
+    "i": int,
+    "f": float,
+    "b": lambda v: v == "True",
+    "n": lambda v: None,
+    "t": datetime.datetime.fromisoformat,
+    "d": datetime.date.fromisoformat,
+    "m": datetime.time.fromisoformat,
+    "r": str,  # anything else is kept as its text
+}
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def encode_value(value) -> Tuple[str, str]:
+    # (type tag, text) of a cell value; decode_value turns it back into the same value and type
+    tag, encode = _ENCODERS.get(type(value), ("r", str))
+    return tag, encode(value)
+
+
+def decode_value(tag: str, text: str):
+    return _DECODERS[tag](text)
+
+
+def _encode_column(values: List) -> Tuple[List["pa.Array"], bool]:
+    import pyarrow as pa
+    kinds = {type(v) for v in values}
+    if len(kinds) <= 1:
+        arrow_type = _ARROW_TYPES.get(kinds.pop() if kinds else str)
+        if arrow_type is not None:
+            try:
+                return [pa.array(values, type=getattr(pa, arrow_type)())], False
+            except (OverflowError, pa.ArrowException):
+                pass  # e.g. ints beyond int64
+    tags, texts = zip(*(encode_value(v) for v in values))
+    return [pa.array(texts, type=pa.string()), pa.array(tags, type=pa.string()).dictionary_encode()], True
+
+
+def records_to_sheet(sheet_name: str, records: List[Dict]) -> Sheet:
+    names = list(records[0].keys()) if records else []
+    return sheet_name, names, [[record.get(name) for record in records] for name in names]
+
+
+def sheet_to_records(sheet: Sheet) -> List[OrderedDict]:
+    _, names, columns = sheet
+    return [OrderedDict(zip(names, row)) for row in zip(*columns)]
+
+
+def frame_to_sheet(sheet_name: str, df: "pd.DataFrame") -> Sheet:
+    return sheet_name, list(df.columns), [df.iloc[:, i].tolist() for i in range(df.shape[1])]
+
+
+def _decode_column(table: "pa.Table", i: int) -> "np.ndarray":
+    # a tagged column as an object array, decoded one tag at a time: ints and
+    # floats are parsed by arrow, only dates, times and the like cell by cell
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    texts = table.column(f"c{i}").combine_chunks()
+    tags = table.column(f"t{i}").combine_chunks()
+    texts_np = texts.to_numpy(zero_copy_only=False)
+    indices = tags.indices.to_numpy(zero_copy_only=False)
+    values = np.empty(len(texts), dtype=object)
+    for code, tag in enumerate(tags.dictionary.to_pylist()):
+        mask = indices == code
+        if not mask.any():
+            continue
+        if tag in ("s", "r"):
+            values[mask] = texts_np[mask]
+        elif tag == "n":
+            values[mask] = None
+        elif tag == "b":
+            values[mask] = texts_np[mask] == "True"
+        elif tag in ("i", "f"):
+            try:
+                parsed = pc.cast(texts.filter(pa.array(mask)), pa.int64() if tag == "i" else pa.float64())
+                values[mask] = parsed.to_numpy(zero_copy_only=False)
+            except pa.ArrowException:  # ints beyond int64
+                values[mask] = [decode_value(tag, text) for text in texts_np[mask]]
+        else:
+            values[mask] = [decode_value(tag, text) for text in texts_np[mask]]
+    return values
+
+
+def _table_to_frame(table: "pa.Table", n_columns: int, tagged: List[int]) -> "pd.DataFrame":
+    import pandas as pd
+    # columns of a single arrow type are converted by arrow, only the tagged ones go through python
+    native = table.select([f"c{i}" for i in range(n_columns) if i not in tagged]).to_pandas()
+    columns = {}
+    for i in range(n_columns):
+        if i in tagged:
+            columns[i] = _decode_column(table, i)
+        else:
+            columns[i] = native[f"c{i}"]
+    return pd.DataFrame(columns)
+
+
+class SheetCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path: str, parser_version: str) -> str:
+        with tracing.span("file_digest", file=path):
+            return hashlib.sha256(f"{file_digest(path)}:{parser_version}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Sheet]]:
+        with tracing.span("sheet_cache_get"):
+            return self._get(key, frames=False)
+
+    def get_frames(self, key: str) -> Optional[List[Tuple[str, "pd.DataFrame"]]]:
+        # the cached sheets as DataFrames, without building python lists for every column
+        with tracing.span("sheet_cache_get"):
+            return self._get(key, frames=True)
+
+    def _get(self, key: str, frames: bool):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        entry = os.path.join(self.cache_dir, key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            sheets = []
+            for sheet in manifest["sheets"]:
+                table = feather.read_table(os.path.join(entry, sheet["file"]), memory_map=True)
+                names = [decode_value(tag, text) for tag, text in sheet["columns"]]
+                if frames:
+                    df = _table_to_frame(table, len(names), sheet["tagged"])
+                    df.columns = names
+                    sheets.append((sheet["name"], df))
+                    continue
+                columns = []
+                for i in range(len(names)):
+                    if i in sheet["tagged"]:
+                        columns.append(_decode_column(table, i).tolist())
+                    else:
+                        columns.append(table.column(f"c{i}").to_pylist())
+                sheets.append((sheet["name"], names, columns))
+        except (OSError, ValueError, KeyError, pa.ArrowException):
+            return None
+        os.utime(manifest_path)  # mark as recently used
+        return sheets
+
+    def put(self, key: str, sheets: List[Sheet], source: str = "") -> None:
+        # a failed write only costs a later miss, it never fails the caller
+        import pyarrow as pa
+        with tracing.span("sheet_cache_put"):
+            try:
+                self._put(key, sheets, source)
+            except (OSError, ValueError, pa.ArrowException) as e:
+                print(f"Could not write {source or key} to the sheet cache: {e}", file=sys.stderr)
+
+    def _put(self, key: str, sheets: List[Sheet], source: str) -> None:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        entry = os.path.join(self.cache_dir, key)
+        tmp_entry = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"  # unique per writer, also across server threads
+        os.makedirs(tmp_entry, exist_ok=True)
+        manifest = {"source": source, "sheets": []}
+        try:
+            for n, (sheet_name, names, columns) in enumerate(sheets):
+                arrays, fields, tagged = [], [], []
+                for i, values in enumerate(columns):
+                    encoded, is_tagged = _encode_column(values)
+                    arrays.extend(encoded)
+                    fields.extend([f"c{i}", f"t{i}"] if is_tagged else [f"c{i}"])
+                    if is_tagged:
+                        tagged.append(i)
+                filename = f"{n}.feather"
+                feather.write_feather(pa.Table.from_arrays(arrays, names=fields), os.path.join(tmp_entry, filename))
+                manifest["sheets"].append({
+                    "name": sheet_name,
+                    "file": filename,
+                    "columns": [encode_value(name) for name in names],
+                    "tagged": tagged,
+                })
+            with open(os.path.join(tmp_entry, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            if os.path.exists(entry):
+                # moved away in one step, so no other writer ever sees it half removed
+                try:
+                    os.replace(entry, f"{tmp_entry}.old")
+                except FileNotFoundError:
+                    pass
+            try:
+                os.replace(tmp_entry, entry)
+            except OSError as e:
+                # another writer stored this key in between: same key, same content, keep theirs
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            shutil.rmtree(f"{tmp_entry}.old", ignore_errors=True)
+        self.evict()
+
+    def evict(self) -> None:
+        # drop least recently used entries until the cache fits in max_bytes
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            manifest_path = os.path.join(entry, "manifest.json")
+            if name.endswith((".tmp", ".old")) or not os.path.isfile(manifest_path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                mtime = os.path.getmtime(manifest_path)
+            except OSError:
+                continue  # replaced or evicted by another writer meanwhile
+            entries.append((mtime, size, entry))
+            total += size
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,157 @@
+# file: tracing.py
+# lightweight instrumentation shared by the command line scripts. named spans
+# record wall time, CPU time and peak RSS; --trace writes them as Chrome
+# trace-event JSON (open in chrome://tracing or https://ui.perfetto.dev) and
+# --profile dumps a cProfile of the whole run, or only of the spans named by
+# --profile-span, across all threads. without these flags span() costs a
+# single check.
+import os
+import sys
+import json
+import time
+import atexit
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_tracer = None
+
+
+def add_arguments(parser) -> None:
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--trace", metavar="PATH", help="Write named timing spans as Chrome trace-event JSON to PATH")
+    group.add_argument("--profile", metavar="PATH", help="Write a cProfile dump (pstats format) of all threads to PATH")
+    group.add_argument("--profile-span", metavar="NAME", help="With --profile, profile only inside the spans with this name")
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+class Tracer:
+    def __init__(self, trace_path: Optional[str] = None, profile_path: Optional[str] = None, profile_span: Optional[str] = None):
+        self.trace_path = trace_path
+        self.profile_path = profile_path
+        self.profile_span = profile_span
+        self.events: List[Dict] = []
+        self.lock = threading.Lock()
+        # before python 3.12 a cProfile.Profile only sees the thread that enabled
+        # it, so every thread gets its own and they are merged by close()
+        self.profilers: List[cProfile.Profile] = []
+        self.local = threading.local()
+        self.warned = False
+        if profile_path and not profile_span:
+            self._thread_profiler().enable()
+            if sys.version_info < (3, 12):  # from 3.12 on one profiler sees all threads
+                threading.setprofile(self._profile_new_thread)
+
+    def _thread_profiler(self) -> cProfile.Profile:
+        profiler = getattr(self.local, "profiler", None)
+        if profiler is None:
+            profiler = self.local.profiler = cProfile.Profile()
+            with self.lock:
+                self.profilers.append(profiler)
+        return profiler
+
+    def _profile_new_thread(self, frame, event, arg) -> None:
+        # installed with threading.setprofile, called once as a thread starts:
+        # enabling the thread's profiler replaces this hook
+        self._thread_profiler().enable()
+
+    def _enable_span_profile(self, name: str) -> bool:
+        try:
+            self._thread_profiler().enable()
+            return True
+        except ValueError:
+            # python 3.12+ allows a single active profiler per process, a span of
+            # the same name already running in another thread covers this one
+            if not self.warned:
+                self.warned = True
+                print(f"--profile-span: overlapping '{name}' spans in other threads are only profiled once", file=sys.stderr)
+            return False
+
+    @contextmanager
+    def span(self, name: str, **args):
+        profile = self.profile_path is not None and name == self.profile_span and self._enable_span_profile(name)
+        start_cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            cpu = time.thread_time() - start_cpu
+            if profile:
+                self._thread_profiler().disable()
+            if self.trace_path:
+                args = {key: str(value) for key, value in args.items()}
+                args["cpu_ms"] = round(cpu * 1000, 3)
+                args["peak_rss_mb"] = peak_rss_mb()
+                event = {
+                    "name": name, "cat": "span", "ph": "X",
+                    "ts": start * 1e6, "dur": (end - start) * 1e6,
+                    "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+                }
+                with self.lock:
+                    self.events.append(event)
+
+    def close(self) -> None:
+        if self.profile_path:
+            threading.setprofile(None)
+            stats = pstats.Stats()
+            with self.lock:
+                profilers = list(self.profilers)
+            for profiler in profilers:
+                profiler.disable()
+                stats.add(profiler)
+            stats.dump_stats(self.profile_path)
+            print(f"cProfile written to {self.profile_path} ({len(profilers)} threads)", file=sys.stderr)
+        if self.trace_path:
+            with self.lock:
+                events = list(self.events)
+            with open(self.trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            self._print_summary(events)
+
+    def _print_summary(self, events: List[Dict]) -> None:
+        totals: Dict[str, List[float]] = {}
+        for event in events:
+            total = totals.setdefault(event["name"], [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += event["dur"] / 1000
+            total[2] += event["args"]["cpu_ms"]
+        print(f"trace written to {self.trace_path} (peak RSS {peak_rss_mb()} MB)", file=sys.stderr)
+        print(f"{'span':<30} {'count':>8} {'wall ms':>12} {'cpu ms':>12}", file=sys.stderr)
+        for name, (count, wall, cpu) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            print(f"{name:<30} {count:>8} {wall:>12.1f} {cpu:>12.1f}", file=sys.stderr)
+
+
+def setup(args) -> None:
+    # enable tracing/profiling from parsed arguments (see add_arguments)
+    global _tracer
+    if getattr(args, "trace", None) or getattr(args, "profile", None):
+        _tracer = Tracer(args.trace, args.profile, getattr(args, "profile_span", None))
+        atexit.register(_tracer.close)
+
+
+@contextmanager
+def span(name: str, **args):
+    """
+    time the enclosed block as a named span, e.g.
+        with tracing.span("download", pmcid=pmcid): ...
+    keyword arguments are attached to the trace event.
+    """
+    if _tracer is None:
+        yield
+        return
+    with _tracer.span(name, **args):
+        yield